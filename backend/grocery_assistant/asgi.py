@@ -0,0 +1,17 @@
+"""
+ASGI config for grocery_assistant project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_assistant.settings')
+os.environ.setdefault('SERVER_MODE', 'asgi')
+
+application = get_asgi_application()
@@ -0,0 +1,74 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from recipes.catalog import CatalogCacheMiss, catalog_cache_only
+
+from .metrics import current_metrics, instrument_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_VIEW_THREADS,
+                thread_name_prefix='async-view'
+            )
+    return _executor
+
+
+def call_in_thread(view, request, *args, **kwargs):
+    # Соединения с БД живут в потоках пула, поэтому закрываем их здесь:
+    # сигнал request_finished приходит в другом потоке.
+    close_old_connections()
+    try:
+        with instrument_connections(current_metrics.get()):
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+            if response.streaming:
+                # Django 3.2 перебирает потоковое тело под ASGI в цикле
+                # событий, где ORM недоступен, поэтому читаем его здесь.
+                response.streaming_content = list(response.streaming_content)
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Асинхронная обёртка синхронного представления.
+
+    Представление выполняется в отдельном пуле из ASYNC_VIEW_THREADS
+    потоков (thread_sensitive=False), так что один воркер держит
+    несколько запросов, ожидающих БД, одновременно.
+    """
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(
+            call_in_thread, thread_sensitive=False, executor=get_executor()
+        )(view, request, *args, **kwargs)
+    return functools.wraps(view)(wrapper)
+
+
+def async_catalog_view(view):
+    """Как async_view, но ответ из кэша справочника отдаётся сразу в
+    цикле событий; в пул потоков уходят только промахи кэша."""
+    in_thread = async_view(view)
+
+    async def wrapper(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            token = catalog_cache_only.set(True)
+            try:
+                return view(request, *args, **kwargs)
+            except CatalogCacheMiss:
+                pass
+            finally:
+                catalog_cache_only.reset(token)
+        return await in_thread(request, *args, **kwargs)
+    return functools.wraps(view)(wrapper)
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+# Бэкенды, которые хранят данные в памяти процесса или не хранят вовсе:
+# записи в них не видны другим воркерам и процессам.
+PROCESS_LOCAL_BACKENDS = frozenset((
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+))
+
+
+def is_cache_shared(alias='default'):
+    """Видят ли запись в кэше все воркеры и команды manage.py."""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,192 @@
+"""Пул соединений с PostgreSQL внутри процесса.
+
+Бэкенд grocery_assistant.db_pool берёт соединения из пула вместо
+Database.connect() и возвращает их туда, когда Django закрывает
+соединение (в конце запроса при CONN_MAX_AGE = 0). Каждый воркер gunicorn
+держит свой пул: после fork пул создаётся заново.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from time import monotonic
+
+import psycopg2
+from psycopg2 import extensions
+
+from ..metrics import current_metrics
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+# Пулы, унаследованные от родителя через fork. Ссылки держим, чтобы сборщик
+# мусора не закрыл соединения: сокеты у процессов общие.
+_inherited_pools = []
+
+
+class ConnectionPool:
+
+    def __init__(self, size, max_age=None, timeout=10, health_check=True):
+        self.size = size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.health_check = health_check
+        self.condition = threading.Condition()
+        self.idle = deque()
+        # id(соединения) -> (время открытия, уровень изоляции по умолчанию).
+        self.opened = {}
+        self.open_count = 0
+        self.stats = dict.fromkeys((
+            'checkouts', 'waits', 'timeouts', 'created', 'reconnects',
+            'discarded'), 0)
+        self.stats['wait_time'] = 0.0
+
+    def checkout(self, connect):
+        """Свободное соединение из пула или новое, если пул не заполнен.
+
+        Возвращает пару (соединение, уровень изоляции). Если все
+        соединения заняты, ждёт освобождения не дольше timeout секунд.
+        """
+        wait_started = None
+        with self.condition:
+            while True:
+                if self.idle:
+                    connection = self.idle.pop()
+                    break
+                if self.open_count < self.size:
+                    self.open_count += 1
+                    connection = None
+                    break
+                if wait_started is None:
+                    wait_started = monotonic()
+                    self.stats['waits'] += 1
+                remaining = self.timeout - (monotonic() - wait_started)
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    logger.warning(
+                        'Пул соединений исчерпан: %s', self.stats)
+                    raise psycopg2.OperationalError(
+                        f'Нет свободных соединений в пуле ({self.size}) '
+                        f'за {self.timeout} с')
+                self.condition.wait(remaining)
+            self.stats['checkouts'] += 1
+            if wait_started is not None:
+                waited = monotonic() - wait_started
+                self.stats['wait_time'] += waited
+                metrics = current_metrics.get()
+                if metrics is not None:
+                    metrics.pool_wait += waited
+
+        reconnect = False
+        if connection is not None:
+            if self.is_usable(connection):
+                return connection, self.opened[id(connection)][1]
+            self.discard(connection, keep_slot=True)
+            reconnect = True
+        try:
+            connection, isolation_level = connect()
+        except Exception:
+            with self.condition:
+                self.open_count -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opened[id(connection)] = (monotonic(), isolation_level)
+            self.stats['created'] += 1
+            if reconnect:
+                self.stats['reconnects'] += 1
+        return connection, isolation_level
+
+    def release(self, connection, discard=False):
+        if not discard:
+            discard = not self.reset(connection) or self.is_expired(connection)
+        if discard:
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def reset(self, connection):
+        if connection.closed:
+            return False
+        try:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def is_expired(self, connection):
+        return (self.max_age is not None
+                and monotonic() - self.opened[id(connection)][0]
+                > self.max_age)
+
+    def is_usable(self, connection):
+        if connection.closed or self.is_expired(connection):
+            return False
+        if not self.health_check:
+            return True
+        try:
+            # В autocommit проверка не открывает транзакцию.
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def discard(self, connection, keep_slot=False):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        with self.condition:
+            self.opened.pop(id(connection), None)
+            self.stats['discarded'] += 1
+            if not keep_slot:
+                self.open_count -= 1
+                self.condition.notify()
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats['wait_time'] = round(stats['wait_time'], 3)
+            stats.update(
+                size=self.size,
+                open=self.open_count,
+                idle=len(self.idle),
+                in_use=self.open_count - len(self.idle),
+            )
+        return stats
+
+
+def get_pool(alias, settings_dict):
+    global _pools_pid
+    pool_settings = settings_dict.get('POOL', {})
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _inherited_pools.extend(_pools.values())
+            _pools.clear()
+            _pools_pid = os.getpid()
+        key = (alias, settings_dict['NAME'])
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                size=pool_settings.get('SIZE', 10),
+                max_age=pool_settings.get('MAX_AGE'),
+                timeout=pool_settings.get('TIMEOUT', 10),
+                health_check=pool_settings.get('HEALTH_CHECK', True),
+            )
+        return _pools[key]
+
+
+def get_pool_stats():
+    """Статистика пулов текущего процесса по алиасам БД."""
+    with _pools_lock:
+        pools = [] if _pools_pid != os.getpid() else list(_pools.items())
+    return {alias: pool.get_stats() for (alias, _), pool in pools}
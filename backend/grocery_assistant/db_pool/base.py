@@ -0,0 +1,33 @@
+from django.db.backends.postgresql import base
+
+from . import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL-бэкенд, который берёт соединения из пула процесса.
+
+    Настройки пула — в ключе POOL настроек БД: SIZE, MAX_AGE (секунды),
+    TIMEOUT (ожидание свободного соединения) и HEALTH_CHECK (SELECT 1
+    перед повторным использованием).
+    """
+
+    def get_pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        def connect():
+            connection = super(DatabaseWrapper, self).get_new_connection(
+                conn_params)
+            return connection, self.isolation_level
+
+        connection, self.isolation_level = self.get_pool().checkout(connect)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            # Соединение, закрываемое посреди atomic, остаётся привязанным
+            # к этой обёртке, поэтому в пул его не возвращаем.
+            self.get_pool().release(
+                self.connection, discard=self.in_atomic_block)
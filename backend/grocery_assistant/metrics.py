@@ -0,0 +1,42 @@
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.sql = []
+        self.pool_wait = 0.0
+        self.instrumented = False
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            if len(self.sql) < settings.REQUEST_METRICS_MAX_LOGGED_QUERIES:
+                self.sql.append((round(duration * 1000, 2), sql))
+
+
+@contextmanager
+def instrument_connections(metrics):
+    """Считает запросы ко всем БД в текущем потоке, если metrics задан."""
+    with ExitStack() as stack:
+        if metrics is not None:
+            metrics.instrumented = True
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+        yield
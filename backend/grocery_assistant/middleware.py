@@ -0,0 +1,214 @@
+import asyncio
+import functools
+import gzip
+import json
+import logging
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework import serializers
+
+from .db_pool import get_pool_stats
+from .metrics import RequestMetrics, current_metrics, instrument_connections
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('grocery_assistant.requests')
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+)
+
+
+def timed_serializer_data(data_property):
+    @functools.wraps(data_property.fget)
+    def data(self):
+        metrics = current_metrics.get()
+        # Вложенные .data (super() у Serializer, сериализаторы внутри
+        # to_representation) уже учтены во внешнем вызове.
+        if metrics is None or metrics.serializing:
+            return data_property.fget(self)
+        metrics.serializing = True
+        start = perf_counter()
+        try:
+            return data_property.fget(self)
+        finally:
+            metrics.serialize_time += perf_counter() - start
+            metrics.serializing = False
+    return property(data)
+
+
+def install_serializer_timing():
+    serializer_class = serializers.BaseSerializer
+    if not getattr(serializer_class, '_metrics_installed', False):
+        serializer_class.data = timed_serializer_data(serializer_class.data)
+        serializer_class._metrics_installed = True
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = match.func
+    view_class = getattr(view, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    actions = getattr(view, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetricsMiddleware:
+    """Число запросов к БД, время БД, сериализации и всего запроса.
+
+    Метрики отдаются в заголовке Server-Timing и пишутся в лог
+    grocery_assistant.requests; медленные запросы логируются вместе с SQL.
+    Включается настройкой REQUEST_METRICS_ENABLED. Под ASGI запросы к БД
+    считаются в представлениях из grocery_assistant.async_views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            with instrument_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        total_time = perf_counter() - start
+        timings = [
+            f'serialize;dur={metrics.serialize_time * 1000:.1f}',
+            f'total;dur={total_time * 1000:.1f}',
+        ]
+        if metrics.instrumented:
+            timings.insert(0, f'db;dur={metrics.db_time * 1000:.1f};'
+                              f'desc="{metrics.queries} queries"')
+        if metrics.pool_wait:
+            timings.insert(0, f'pool;dur={metrics.pool_wait * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        self.log(request, response, metrics, total_time)
+        return response
+
+    def log(self, request, response, metrics, total_time):
+        record = {
+            'view': get_view_name(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': metrics.queries if metrics.instrumented else None,
+            'db_ms': (round(metrics.db_time * 1000, 1)
+                      if metrics.instrumented else None),
+            'serialize_ms': round(metrics.serialize_time * 1000, 1),
+            'pool_wait_ms': round(metrics.pool_wait * 1000, 1),
+            'total_ms': round(total_time * 1000, 1),
+        }
+        pool_stats = get_pool_stats()
+        if pool_stats:
+            record['db_pool'] = pool_stats
+        is_slow = (
+            record['total_ms'] > settings.REQUEST_METRICS_SLOW_MS
+            or metrics.queries > settings.REQUEST_METRICS_SLOW_QUERIES
+        )
+        if is_slow:
+            record['sql'] = metrics.sql
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+def get_accepted_encodings(header):
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    return (content_type.startswith('text/')
+            or content_type in COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответы не короче RESPONSE_COMPRESSION_MIN_SIZE байт.
+
+    brotli выбирается, если клиент его принимает и пакет установлен,
+    иначе gzip. Потоковые ответы не сжимаются.
+    """
+
+    def process_response(self, request, response):
+        if (response.streaming
+                or response.has_header('Content-Encoding')
+                or not is_compressible(response)
+                or len(response.content)
+                < settings.RESPONSE_COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = get_accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+            content = brotli.compress(
+                response.content,
+                quality=settings.BROTLI_COMPRESSION_QUALITY)
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+            content = gzip.compress(
+                response.content,
+                compresslevel=settings.GZIP_COMPRESSION_LEVEL, mtime=0)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -32,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'grocery_assistant.middleware.RequestMetricsMiddleware',
+    'grocery_assistant.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,17 +64,57 @@ TEMPLATES = [
 WSGI_APPLICATION = 'grocery_assistant.wsgi.application'
 
 
+# asgi.py выставляет SERVER_MODE=asgi: горячие представления на чтение
+# становятся асинхронными (см. grocery_assistant.async_views).
+ASYNC_VIEWS = os.getenv('SERVER_MODE', 'wsgi') == 'asgi'
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', 16))
+
+# DB_POOL_SIZE=0 отключает пул; тогда соединения можно держать открытыми
+# между запросами через DB_CONN_MAX_AGE. Воркеру ASGI нужно соединение на
+# каждый поток ASYNC_VIEW_THREADS и ещё одно.
+DB_POOL_SIZE = int(os.getenv(
+    'DB_POOL_SIZE', ASYNC_VIEW_THREADS + 1 if ASYNC_VIEWS else 10))
+if ASYNC_VIEWS and DB_POOL_SIZE:
+    # Потокам сверх размера пула пришлось бы ждать соединения.
+    ASYNC_VIEW_THREADS = max(1, min(ASYNC_VIEW_THREADS, DB_POOL_SIZE - 1))
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': ('grocery_assistant.db_pool' if DB_POOL_SIZE
+                   else 'django.db.backends.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'MAX_AGE': int(os.getenv('DB_POOL_MAX_AGE', 1800)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'HEALTH_CHECK': (
+                os.getenv('DB_POOL_HEALTH_CHECK', 'true').lower() == 'true'),
+        },
     }
 }
 
+# REDIS_URL включает общий для воркеров и команд manage.py кэш. Без него
+# кэш живёт в памяти процесса, и gunicorn по умолчанию запускает один
+# воркер (см. gunicorn.conf.py).
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -112,7 +154,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'grocery_assistant.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'grocery_assistant.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
@@ -136,6 +187,36 @@ DJOSER = {
         'user_list': ['rest_framework.permissions.IsAuthenticated'],
     }
 }
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+FEED_FANOUT_BATCH_SIZE = int(os.getenv('FEED_FANOUT_BATCH_SIZE', 1000))
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 60 * 60))
+# Ответы API от RESPONSE_COMPRESSION_MIN_SIZE байт сжимаются brotli или gzip
+# в зависимости от Accept-Encoding.
+RESPONSE_COMPRESSION_MIN_SIZE = int(
+    os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+GZIP_COMPRESSION_LEVEL = int(os.getenv('GZIP_COMPRESSION_LEVEL', 6))
+BROTLI_COMPRESSION_QUALITY = int(os.getenv('BROTLI_COMPRESSION_QUALITY', 5))
+REQUEST_METRICS_ENABLED = (
+    os.getenv('REQUEST_METRICS_ENABLED', 'false').lower() == 'true')
+REQUEST_METRICS_SLOW_MS = int(os.getenv('REQUEST_METRICS_SLOW_MS', 500))
+REQUEST_METRICS_SLOW_QUERIES = int(
+    os.getenv('REQUEST_METRICS_SLOW_QUERIES', 50))
+REQUEST_METRICS_MAX_LOGGED_QUERIES = 200
+# Кэш токенов (users.authentication): в кэше Django и в LRU процесса.
+TOKEN_AUTH_CACHE_TTL = int(os.getenv('TOKEN_AUTH_CACHE_TTL', 300))
+TOKEN_AUTH_LOCAL_TTL = int(os.getenv('TOKEN_AUTH_LOCAL_TTL', 10))
+TOKEN_AUTH_LOCAL_SIZE = int(os.getenv('TOKEN_AUTH_LOCAL_SIZE', 1000))
+# Выгрузка списка покупок (recipes.shopping_list).
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', 24 * 60 * 60))
+SHOPPING_LIST_PDF_WORKERS = int(os.getenv('SHOPPING_LIST_PDF_WORKERS', 2))
+SHOPPING_LIST_PDF_TIMEOUT = int(os.getenv('SHOPPING_LIST_PDF_TIMEOUT', 30))
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -144,6 +225,13 @@ LOGGING = {
             'class': 'logging.StreamHandler',
         },
     },
+    'loggers': {
+        'grocery_assistant.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
     'root': {
         'handlers': ['console'],
         'level': 'DEBUG',
@@ -1,21 +1,46 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path, re_path
+from django.urls import URLPattern, include, path, re_path
 from recipes.views import (CustomUserViewSet, IngredientViewset, RecipeViewSet,
                            TagViewset)
 from rest_framework import routers
 
+from .async_views import async_catalog_view, async_view
+
 router = routers.DefaultRouter()
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'tags', TagViewset, basename='tags')
 router.register(r'ingredients', IngredientViewset, basename='ingredients')
 router.register(r'users', CustomUserViewSet, basename='users')
 
+ASYNC_ROUTES = {
+    'tags-list': async_catalog_view,
+    'tags-detail': async_catalog_view,
+    'ingredients-list': async_catalog_view,
+    'ingredients-detail': async_catalog_view,
+    'recipes-list': async_view,
+    'recipes-detail': async_view,
+    'recipes-download-shopping-cart': async_view,
+    'recipes-shopping-list': async_view,
+    'users-subscriptions': async_view,
+}
+
+
+def get_api_urls():
+    if not settings.ASYNC_VIEWS:
+        return router.urls
+    return [
+        URLPattern(pattern.pattern, ASYNC_ROUTES[pattern.name](
+            pattern.callback), pattern.default_args, pattern.name)
+        if pattern.name in ASYNC_ROUTES else pattern
+        for pattern in router.urls
+    ]
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include(router.urls)),
+    path('api/', include(get_api_urls())),
     re_path(r'api/auth/', include('djoser.urls.authtoken')),
 
 
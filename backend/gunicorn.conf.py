@@ -0,0 +1,27 @@
+# Конфигурация gunicorn. SERVER_MODE=wsgi — синхронные воркеры,
+# SERVER_MODE=asgi — воркеры uvicorn с асинхронными представлениями.
+import multiprocessing
+import os
+
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+# Кэши токенов, справочников и списков покупок инвалидируются через кэш
+# Django. Без общего кэша (REDIS_URL) воркеры разошлись бы, поэтому
+# по умолчанию воркер один.
+shared_cache = bool(os.getenv('REDIS_URL'))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+if server_mode == 'asgi':
+    wsgi_app = 'grocery_assistant.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Воркер держит много запросов сразу: запросы к БД уходят в пул из
+    # ASYNC_VIEW_THREADS потоков, поэтому хватает воркера на ядро.
+    default_workers = multiprocessing.cpu_count() if shared_cache else 1
+else:
+    wsgi_app = 'grocery_assistant.wsgi:application'
+    default_workers = (
+        multiprocessing.cpu_count() * 2 + 1 if shared_cache else 1)
+
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
@@ -3,6 +3,9 @@ from django.forms import ModelForm
 
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag)
+from .search import update_search_vectors
+from .shopping_list import bump_recipe_carts
+from .shopping_totals import change_recipe_totals, get_amount_deltas
 
 admin.site.empty_value_display = 'Не задано'
 
@@ -53,14 +56,20 @@ class IngredientRecipeInline(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('name', 'author', 'cooking_time',
-                    'image', 'get_favorite_count',)
+                    'image', 'favorites_count', 'in_carts_count',)
     list_filter = ('author', 'tags', 'ingredients',)
     search_fields = ('name', 'author__username',)
     filter_horizontal = ['tags']
-
-    def get_favorite_count(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
-
-    get_favorite_count.short_description = 'Добавлено в избранное'
+    list_select_related = ('author',)
+
+    def save_related(self, request, form, formsets, change):
+        recipe_ingredients = IngredientRecipe.objects.filter(
+            recipe=form.instance).values_list('ingredient_id', 'amount')
+        old_amounts = dict(recipe_ingredients)
+        super().save_related(request, form, formsets, change)
+        change_recipe_totals(form.instance.pk, get_amount_deltas(
+            old_amounts, dict(recipe_ingredients.all())))
+        update_search_vectors(Recipe.objects.filter(pk=form.instance.pk))
+        bump_recipe_carts(form.instance.pk)
 
     inlines = [IngredientRecipeInline]
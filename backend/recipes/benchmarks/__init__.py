@@ -0,0 +1,250 @@
+import http.client
+import json
+import math
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from importlib import import_module
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+SUITE_MODULES = (
+    'recipes.benchmarks.auth',
+    'recipes.benchmarks.endpoints',
+    'recipes.benchmarks.rendering',
+    'recipes.benchmarks.serializers',
+    'recipes.benchmarks.units',
+)
+SUITES = {}
+
+# concurrent=False — случай меняет общее состояние и гоняется в один поток;
+# info — дополнительные величины для отчёта (например, размер ответа).
+Case = namedtuple(
+    'Case', ('name', 'run', 'concurrent', 'info'), defaults=(True, None))
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def register(name):
+    def decorator(build_cases):
+        SUITES[name] = build_cases
+        return build_cases
+    return decorator
+
+
+def load_suites():
+    for module in SUITE_MODULES:
+        import_module(module)
+    return SUITES
+
+
+class ClientTransport:
+    """Запросы через тестовый клиент Django в том же процессе."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.headers = {}
+
+    def authenticate(self, token):
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {token}'}
+
+    def request(self, method, path, data=None, expected=(200,)):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+        if data is not None:
+            data = json.dumps(data)
+        counter = QueryCounter()
+        with counter:
+            response = self.local.client.generic(
+                method.upper(), path, data or '', 'application/json',
+                **self.headers)
+            check_status(method, path, response.status_code, expected)
+            body = (b''.join(response) if response.streaming
+                    else response.content)
+        return counter.count, body
+
+
+class HttpTransport:
+    """Запросы по HTTP к запущенному серверу (gunicorn, uvicorn).
+
+    Число SQL-запросов берётся из заголовка Server-Timing, поэтому на
+    сервере должен быть включён REQUEST_METRICS_ENABLED.
+    """
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+        self.headers = {'Content-Type': 'application/json'}
+
+    def authenticate(self, token):
+        self.headers['Authorization'] = f'Token {token}'
+
+    def get_connection(self):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = http.client.HTTPConnection(
+                self.host, self.port)
+        return self.local.connection
+
+    def request(self, method, path, data=None, expected=(200,)):
+        body = None if data is None else json.dumps(data)
+        for attempt in range(2):
+            connection = self.get_connection()
+            try:
+                connection.request(
+                    method.upper(), self.prefix + path, body, self.headers)
+                response = connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                del self.local.connection
+                # Сервер мог закрыть простаивавшее keep-alive соединение.
+                if attempt:
+                    raise
+        check_status(method, path, response.status, expected)
+        match = SERVER_TIMING_QUERIES.search(
+            response.getheader('Server-Timing', ''))
+        return int(match.group(1)) if match else None, content
+
+
+def check_status(method, path, status, expected):
+    if status not in expected:
+        raise BenchmarkError(
+            f'{method.upper()} {path}: неожиданный статус {status}')
+
+
+class BenchmarkContext:
+
+    def __init__(self, transport, email, password):
+        self.transport = transport
+        self.email = email
+        self.password = password
+        self.token = None
+
+    def login(self):
+        if self.token is None:
+            _, body = self.transport.request('post', reverse('login'), {
+                'email': self.email, 'password': self.password})
+            self.token = json.loads(body)['auth_token']
+            self.transport.authenticate(self.token)
+        return self.token
+
+    def get_json(self, path):
+        return json.loads(self.transport.request('get', path)[1])
+
+
+class QueryCounter:
+    """Считает запросы ко всем БД в текущем потоке внутри блока with."""
+
+    def __init__(self):
+        self.count = 0
+        self.stack = ExitStack()
+
+    def __enter__(self):
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.stack.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def call(func, *args, **kwargs):
+    """run для случая, который не обращается к БД."""
+    def run():
+        func(*args, **kwargs)
+    return run
+
+
+def measure(case):
+    """Время выполнения case.run() и число запросов, которое он вернул
+    (None — число неизвестно)."""
+    start = perf_counter()
+    queries = case.run()
+    return (perf_counter() - start) * 1000, queries
+
+
+def run_worker(case, iterations):
+    try:
+        return [measure(case) for _ in range(iterations)]
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+def run_case(case, iterations, warmup=3, concurrency=1):
+    for _ in range(warmup):
+        case.run()
+    start = perf_counter()
+    if concurrency > 1 and case.concurrent:
+        share, remainder = divmod(iterations, concurrency)
+        shares = [share + (worker < remainder)
+                  for worker in range(concurrency)]
+        with ThreadPoolExecutor(concurrency) as executor:
+            samples = [
+                sample
+                for worker_samples in executor.map(
+                    run_worker, [case] * concurrency, shares)
+                for sample in worker_samples
+            ]
+    else:
+        samples = run_worker(case, iterations)
+    wall_time = perf_counter() - start
+    timings = [timing for timing, _ in samples]
+    queries = [count for _, count in samples if count is not None]
+    return {
+        'p50': round(percentile(timings, 50), 2),
+        'p95': round(percentile(timings, 95), 2),
+        'p99': round(percentile(timings, 99), 2),
+        'throughput': round(len(samples) / wall_time, 1),
+        'queries': max(queries) if queries else None,
+        **(case.info or {}),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta=1.0):
+    """Регрессии относительно базовых результатов.
+
+    Время считается регрессией, если p95 вырос больше чем на tolerance и
+    больше чем на min_delta миллисекунд; число запросов — при любом росте.
+    """
+    regressions = []
+    for suite, cases in results.items():
+        for name, current in cases.items():
+            previous = baseline.get(suite, {}).get(name)
+            if previous is None:
+                continue
+            if (current['p95'] > previous['p95'] * (1 + tolerance)
+                    and current['p95'] - previous['p95'] > min_delta):
+                regressions.append(
+                    f'{suite} / {name}: p95 {previous["p95"]} → '
+                    f'{current["p95"]} мс')
+            if (current['queries'] is not None
+                    and previous['queries'] is not None
+                    and current['queries'] > previous['queries']):
+                regressions.append(
+                    f'{suite} / {name}: запросов {previous["queries"]} → '
+                    f'{current["queries"]}')
+    return regressions
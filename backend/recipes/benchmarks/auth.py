@@ -0,0 +1,42 @@
+import os
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.urls import reverse
+
+from . import Case, call, register
+
+UNKNOWN_EMAIL = 'benchmark-unknown@example.com'
+
+
+def login_case(context, email, password, expected):
+    credentials = {'email': email, 'password': password}
+
+    def run():
+        return context.transport.request(
+            'post', reverse('login'), credentials, expected=expected)[0]
+    return run
+
+
+@register('auth')
+def auth_cases(context):
+    """Вход по токену: успешный, с неверным паролем и с неизвестной почтой.
+
+    Время входа почти целиком уходит на хэш пароля, поэтому пропускная
+    способность на ядро — throughput при --concurrency, равном числу ядер,
+    делённый на cpus. Для сравнения отдельно измеряется одна проверка хэша.
+    """
+    info = {'cpus': os.cpu_count()}
+    encoded = make_password(context.password)
+    return [
+        Case('POST login',
+             login_case(context, context.email, context.password, (200,)),
+             info=info),
+        Case('POST login: wrong password',
+             login_case(context, context.email, 'wrong-password', (400,)),
+             info=info),
+        Case('POST login: unknown email',
+             login_case(context, UNKNOWN_EMAIL, context.password, (400,)),
+             info=info),
+        Case('check_password', call(check_password, context.password,
+                                    encoded), info=info),
+    ]
@@ -0,0 +1,129 @@
+from urllib.parse import quote
+
+from django.urls import reverse
+from grocery_assistant.urls import router
+
+from . import Case, register
+
+SKIPPED_ACTIONS = ('create', 'update', 'partial_update', 'destroy')
+BULK_SIZE = 20
+QUERY_VARIANTS = {
+    'recipes-list': (
+        '?limit=6',
+        '?is_favorited=1',
+        '?is_in_shopping_cart=1',
+        '?tags={tag_slug}',
+        '?search={search}',
+        '?ordering=-favorites_count',
+    ),
+    'ingredients-list': ('?name={ingredient_prefix}',),
+    'users-subscriptions': ('?recipes_limit=3',),
+    'recipes-download-shopping-cart': (
+        '?format=csv', '?format=pdf', '?format=json'),
+}
+
+
+def get_samples(context):
+    """Объекты для маршрутов с pk: читаемые и свободные для POST/DELETE."""
+    me = context.get_json(reverse('users-me'))
+    recipes = context.get_json(reverse('recipes-list') + '?limit=100')
+    users = context.get_json(reverse('users-list') + '?limit=100')
+    tag = context.get_json(reverse('tags-list'))[0]
+    ingredient = context.get_json(
+        reverse('ingredients-list') + '?limit=1')[0]
+    free_recipes = [
+        recipe for recipe in recipes['results']
+        if not recipe['is_favorited']
+        and not recipe['is_in_shopping_cart']
+        and recipe['author']['id'] != me['id']]
+    free_recipe = free_recipes[0]
+    free_author = next(
+        user for user in users['results']
+        if not user['is_subscribed'] and user['id'] != me['id'])
+    return {
+        'recipes': {'read': recipes['results'][0]['id'],
+                    'toggle': free_recipe['id'],
+                    'bulk': [recipe['id']
+                             for recipe in free_recipes[:BULK_SIZE]]},
+        'users': {'read': me['id'], 'toggle': free_author['id']},
+        'tags': {'read': tag['id']},
+        'ingredients': {'read': ingredient['id']},
+        'format': {
+            'tag_slug': quote(tag['slug']),
+            'search': quote(free_recipe['name'].split()[0]),
+            'ingredient_prefix': quote(ingredient['name'][:2]),
+        },
+    }
+
+
+def get_case(transport, path):
+    def run():
+        return transport.request('get', path)[0]
+    return run
+
+
+def login_case(context):
+    credentials = {'email': context.email, 'password': context.password}
+
+    def run():
+        return context.transport.request(
+            'post', reverse('login'), credentials)[0]
+    return run
+
+
+def toggle_case(transport, path, data=None, expected=((201,), (204,))):
+    def run():
+        created, _ = transport.request(
+            'post', path, data, expected=expected[0])
+        deleted, _ = transport.request(
+            'delete', path, data, expected=expected[1])
+        if created is None or deleted is None:
+            return None
+        return created + deleted
+    return run
+
+
+@register('endpoints')
+def endpoint_cases(context):
+    """GET по всем маршрутам роутера и пары POST+DELETE для переключателей.
+
+    Маршруты создания, изменения и удаления объектов не измеряются, чтобы
+    прогон не менял данные.
+    """
+    context.login()
+    samples = get_samples(context)
+    transport = context.transport
+    cases = [Case('POST login', login_case(context))]
+    for _, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            mapping = {method: action
+                       for method, action in route.mapping.items()
+                       if hasattr(viewset, action)}
+            name = route.name.format(basename=basename)
+            get_action = mapping.get('get')
+            read_kwargs = (
+                {'pk': samples[basename]['read']} if route.detail else {})
+            if get_action and get_action not in SKIPPED_ACTIONS:
+                path = reverse(name, kwargs=read_kwargs)
+                cases.append(Case(f'GET {name}', get_case(transport, path)))
+                for query in QUERY_VARIANTS.get(name, ()):
+                    cases.append(Case(
+                        f'GET {name}{query}',
+                        get_case(transport, path + query.format(
+                            **samples['format']))))
+            if (route.detail and mapping.get('post') is not None
+                    and mapping.get('post') == mapping.get('delete')):
+                path = reverse(name, kwargs={
+                    'pk': samples[basename]['toggle']})
+                cases.append(Case(
+                    f'POST+DELETE {name}', toggle_case(transport, path),
+                    concurrent=False))
+            if (not route.detail and mapping.get('post') is not None
+                    and mapping.get('post') == mapping.get('delete')):
+                ids = samples[basename]['bulk']
+                cases.append(Case(
+                    f'POST+DELETE {name}', toggle_case(
+                        transport, reverse(name), {'ids': ids},
+                        ((200,), (200,))),
+                    concurrent=False, info={'ids': len(ids)}))
+    return cases
@@ -0,0 +1,50 @@
+import gzip
+import json
+
+from django.conf import settings
+from django.urls import reverse
+from grocery_assistant.renderers import ORJSONRenderer, orjson
+from rest_framework.renderers import JSONRenderer
+
+from . import Case, call, register
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RECIPES_PAGE = '?limit=100'
+
+
+@register('rendering')
+def rendering_cases(context):
+    """JSON-рендеринг, разбор и сжатие страницы /api/recipes/?limit=100."""
+    context.login()
+    path = reverse('recipes-list') + RECIPES_PAGE
+    data = context.get_json(path)
+    body = JSONRenderer().render(data)
+    cases = [
+        Case(f'GET recipes-list{RECIPES_PAGE}',
+             lambda: context.transport.request('get', path)[0]),
+        Case('render: json', call(JSONRenderer().render, data),
+             info={'bytes': len(body)}),
+        Case('parse: json', call(json.loads, body)),
+    ]
+    if orjson is not None:
+        cases += [
+            Case('render: orjson', call(ORJSONRenderer().render, data),
+                 info={'bytes': len(ORJSONRenderer().render(data))}),
+            Case('parse: orjson', call(orjson.loads, body)),
+        ]
+    level = settings.GZIP_COMPRESSION_LEVEL
+    cases.append(Case(
+        f'gzip: level {level}',
+        call(gzip.compress, body, level),
+        info={'bytes': len(gzip.compress(body, level))}))
+    if brotli is not None:
+        quality = settings.BROTLI_COMPRESSION_QUALITY
+        cases.append(Case(
+            f'brotli: quality {quality}',
+            call(brotli.compress, body, quality=quality),
+            info={'bytes': len(brotli.compress(body, quality=quality))}))
+    return cases
@@ -0,0 +1,59 @@
+from django.test import RequestFactory
+from django.urls import reverse
+from grocery_assistant.renderers import ORJSONRenderer
+from rest_framework.request import Request
+from users.models import CustomUser
+
+from ..models import Recipe
+from ..serializers import RecipeCreateSerializer, RecipeReadSerializer
+from . import BenchmarkError, Case, QueryCounter, register
+
+PAGE_SIZE = 100
+
+
+def serialize_case(serializer_class, queryset, context):
+    """Загрузка страницы рецептов и её сериализация."""
+    def run():
+        with QueryCounter() as counter:
+            serializer_class(
+                list(queryset.all()), many=True,
+                context=dict(context)).data
+        return counter.count
+    return run
+
+
+def check_parity(queryset, context):
+    render = ORJSONRenderer().render
+    for recipes in (list(queryset), list(queryset[:1])):
+        many = len(recipes) > 1
+        data = recipes if many else recipes[0]
+        expected = render(RecipeCreateSerializer(
+            data, many=many, context=dict(context)).data)
+        actual = render(RecipeReadSerializer(
+            data, many=many, context=dict(context)).data)
+        if actual != expected:
+            raise BenchmarkError(
+                'RecipeReadSerializer расходится с RecipeCreateSerializer')
+
+
+@register('serializers')
+def serializer_cases(context):
+    """RecipeCreateSerializer и RecipeReadSerializer на странице из 100
+    рецептов; перед замером проверяется совпадение ответов."""
+    user = CustomUser.objects.get(email=context.email)
+    request = Request(RequestFactory().get(reverse('recipes-list')))
+    request.user = user
+    serializer_context = {'request': request}
+    page = slice(None, PAGE_SIZE)
+    prefetched = Recipe.objects.for_reading(user)[page]
+    plain = Recipe.objects.for_reading(user, prefetch=False)[page]
+    check_parity(plain, serializer_context)
+    info = {'recipes': len(plain)}
+    return [
+        Case('RecipeCreateSerializer',
+             serialize_case(RecipeCreateSerializer, prefetched,
+                            serializer_context), info=info),
+        Case('RecipeReadSerializer',
+             serialize_case(RecipeReadSerializer, plain, serializer_context),
+             info=info),
+    ]
@@ -0,0 +1,42 @@
+import random
+
+from recipes.units import aggregate
+
+from . import Case, call, register
+
+ROW_COUNTS = (1000, 10000)
+# Единицы с весами, близкими к справочнику, и несколько альтернативных
+# написаний.
+UNIT_WEIGHTS = (
+    ('г', 40), ('кг', 5), ('шт.', 10), ('по вкусу', 8), ('ст. л.', 8),
+    ('ч. л.', 6), ('стакан', 4), ('мл', 5), ('л', 2), ('щепотка', 2),
+    ('гр', 2), ('ст.л.', 2), ('шт', 2), ('капля', 1), ('пучок', 1),
+)
+
+
+def make_rows(count, seed=0):
+    """Строки корзины: примерно каждый третий продукт встречается
+    в нескольких единицах."""
+    generator = random.Random(seed)
+    units = [unit for unit, _ in UNIT_WEIGHTS]
+    weights = [weight for _, weight in UNIT_WEIGHTS]
+    products = max(1, count // 3)
+    return [
+        (f'продукт {generator.randrange(products)}',
+         generator.randint(1, 500),
+         unit)
+        for unit in generator.choices(units, weights, k=count)
+    ]
+
+
+@register('units')
+def units_cases(context):
+    """Сведение списка покупок с приведением единиц на синтетических
+    корзинах."""
+    cases = []
+    for count in ROW_COUNTS:
+        rows = make_rows(count)
+        cases.append(Case(
+            f'aggregate: {count} rows', call(aggregate, rows),
+            info={'rows': count, 'lines': len(aggregate(rows))}))
+    return cases
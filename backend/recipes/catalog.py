@@ -0,0 +1,110 @@
+import bisect
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Ingredient, Tag
+
+VERSION_KEY = 'catalog:{}:version'
+ENTRY_KEY = 'catalog:{}:{}:{}'
+
+# Включается асинхронными представлениями: промах кэша не идёт в БД, а
+# поднимает CatalogCacheMiss, и запрос обрабатывается в пуле потоков.
+catalog_cache_only = ContextVar('catalog_cache_only', default=False)
+
+
+class CatalogCacheMiss(Exception):
+    pass
+
+
+def get_catalog_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_catalog_version(name):
+    """Сбрасывает закэшированные ответы справочника.
+
+    Версия — случайная строка, а не счётчик: после вытеснения ключа из
+    кэша новая версия не совпадёт со старой, и старый ETag не подойдёт
+    к другому содержимому. Меняется после коммита, иначе параллельный
+    запрос закэширует под новой версией старые данные.
+    """
+    key = VERSION_KEY.format(name)
+    version = uuid.uuid4().hex
+    transaction.on_commit(lambda: cache.set(key, version, timeout=None))
+
+
+def get_catalog_entry(name, key, build):
+    """Значение build(), закэшированное до смены версии справочника."""
+    cache_key = ENTRY_KEY.format(name, get_catalog_version(name), key)
+    value = cache.get(cache_key)
+    if value is None:
+        if catalog_cache_only.get():
+            raise CatalogCacheMiss(cache_key)
+        value = build()
+        cache.set(cache_key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def get_tag_map():
+    return get_catalog_entry(
+        'tags', 'slug-map',
+        lambda: dict(Tag.objects.values_list('slug', 'id'))
+    )
+
+
+class IngredientIndex:
+    """Отсортированный индекс справочника ингредиентов в памяти процесса.
+
+    Строится лениво при первом обращении и перестраивается, когда меняется
+    версия справочника (см. recipes.signals) или истекает
+    INGREDIENT_INDEX_TTL. Для инвалидации между воркерами нужен общий
+    бэкенд кэша.
+    """
+    catalog = 'ingredients'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = (None, 0, (), ())
+
+    def _load(self):
+        version = get_catalog_version(self.catalog)
+        current_version, built_at, keys, rows = self._state
+        ttl = getattr(settings, 'INGREDIENT_INDEX_TTL', 300)
+        if version == current_version and time.monotonic() - built_at < ttl:
+            return keys, rows
+        with self._lock:
+            if self._state[0] != current_version or self._state[1] != built_at:
+                return self._state[2], self._state[3]
+            entries = sorted(
+                (ingredient['name'].lower(), ingredient['id'], ingredient)
+                for ingredient in Ingredient.objects.values(
+                    'id', 'name', 'measurement_unit')
+            )
+            keys = tuple(entry[0] for entry in entries)
+            rows = tuple(entry[2] for entry in entries)
+            self._state = (version, time.monotonic(), keys, rows)
+        return keys, rows
+
+    def search(self, prefix='', limit=None):
+        keys, rows = self._load()
+        prefix = prefix.lower()
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\U0010ffff', lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return list(rows[start:end])
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,42 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from users.models import AuthorSubscription, CustomUser
+
+from .models import Favorite, Recipe, ShoppingCart
+
+
+def change_counters(model, pks, field, delta):
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_counter(model, pk, field, delta):
+    return change_counters(model, [pk], field, delta)
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0)
+    )
+
+
+def reconcile_counters():
+    return {
+        'recipes': Recipe.objects.update(
+            favorites_count=count_subquery(Favorite, 'recipe'),
+            in_carts_count=count_subquery(ShoppingCart, 'recipe'),
+        ),
+        'users': CustomUser.objects.update(
+            recipes_count=count_subquery(Recipe, 'author'),
+            subscribers_count=count_subquery(AuthorSubscription, 'author'),
+        ),
+    }
@@ -0,0 +1,198 @@
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+from users.models import AuthorSubscription, CustomUser
+
+from .counters import reconcile_counters
+from .feed import backfill_subscription
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .search import update_search_vectors
+from .shopping_totals import rebuild_totals
+
+FAKE_PASSWORD = 'fake-password'
+FAKE_EMAIL = '{}@example.com'
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D'),
+    ('Обед', '#49B64E'),
+    ('Ужин', '#8775D2'),
+    ('Десерт', '#F5C242'),
+    ('Выпечка', '#B5651D'),
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена',
+               'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Иванова', 'Петров', 'Смирнова', 'Кузнецов', 'Попова',
+              'Соколов', 'Лебедева', 'Новиков', 'Морозова', 'Волков')
+ADJECTIVES = ('Домашний', 'Быстрый', 'Летний', 'Сытный', 'Бабушкин',
+              'Праздничный', 'Острый', 'Лёгкий')
+DISHES = ('суп', 'салат', 'пирог', 'омлет', 'плов', 'рагу', 'гуляш',
+          'кекс', 'борщ', 'шашлык', 'рулет', 'жульен')
+STEPS = (
+    'Нарежьте овощи небольшими кубиками.',
+    'Разогрейте сковороду с растительным маслом.',
+    'Обжарьте до золотистой корочки.',
+    'Добавьте специи и перемешайте.',
+    'Тушите под крышкой на медленном огне.',
+    'Запекайте в разогретой духовке.',
+    'Посолите и поперчите по вкусу.',
+    'Подавайте горячим, украсив зеленью.',
+)
+AMOUNTS = (1, 2, 3, 5, 10, 20, 50, 100, 150, 200, 250, 300, 500, 1000)
+
+
+def zipf_weights(size, exponent=1.1):
+    """Накопленные веса: несколько популярных элементов и длинный хвост."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def pick_distinct(rng, population, cum_weights, count):
+    count = min(count, len(population))
+    picked = set()
+    while len(picked) < count:
+        picked.update(rng.choices(
+            population, cum_weights=cum_weights, k=count - len(picked)))
+    return sorted(picked)
+
+
+def bulk_create_in_batches(model, objects, batch_size):
+    objects = iter(objects)
+    created = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return created
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        created += len(batch)
+
+
+def get_max_pk(model):
+    return model.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+
+
+def ensure_tags():
+    if not Tag.objects.exists():
+        for name, color in DEFAULT_TAGS:
+            Tag.objects.create(name=name, color=color)
+    return list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+
+
+def create_users(rng, count, prefix, password, batch_size):
+    last_pk = get_max_pk(CustomUser)
+    start = CustomUser.objects.filter(username__startswith=prefix).count()
+    password_hash = make_password(password)
+    CustomUser.objects.bulk_create(
+        (CustomUser(
+            username=f'{prefix}{number}',
+            email=FAKE_EMAIL.format(f'{prefix}{number}'),
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            password=password_hash)
+         for number in range(start, start + count)),
+        batch_size=batch_size
+    )
+    return list(CustomUser.objects.filter(pk__gt=last_pk).order_by(
+        'pk').values_list('pk', flat=True))
+
+
+def create_recipes(rng, count, author_ids, batch_size):
+    last_pk = get_max_pk(Recipe)
+    start = Recipe.objects.count()
+    authors = rng.choices(
+        author_ids, cum_weights=zipf_weights(len(author_ids)), k=count)
+    Recipe.objects.bulk_create(
+        (Recipe(
+            author_id=author_id,
+            name=(f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} '
+                  f'№{start + number}'),
+            text=' '.join(rng.sample(STEPS, 3)),
+            cooking_time=rng.randint(5, 180))
+         for number, author_id in enumerate(authors)),
+        batch_size=batch_size
+    )
+    # date заполняется auto_now_add, поэтому разносим даты отдельным шагом.
+    recipes = list(Recipe.objects.filter(pk__gt=last_pk).order_by(
+        'pk').only('pk', 'date'))
+    today = timezone.now().date()
+    for recipe in recipes:
+        recipe.date = today - timedelta(days=rng.randint(0, 365))
+    Recipe.objects.bulk_update(recipes, ['date'], batch_size=batch_size)
+    return [recipe.pk for recipe in recipes]
+
+
+def generate_fake_data(users=100, recipes=1000, favorites=20, carts=5,
+                       subscriptions=10, seed=0, batch_size=1000,
+                       prefix='user', password=FAKE_PASSWORD):
+    """Генерирует пользователей, рецепты, избранное, корзины и подписки.
+
+    Популярность ингредиентов, тегов, авторов и рецептов распределена по
+    закону Ципфа; при одинаковом seed на пустой базе данные совпадают.
+    """
+    rng = random.Random(seed)
+    ingredient_ids = list(
+        Ingredient.objects.order_by('pk').values_list('pk', flat=True))
+    rng.shuffle(ingredient_ids)
+    ingredient_weights = zipf_weights(len(ingredient_ids))
+    tag_ids = ensure_tags()
+    tag_weights = zipf_weights(len(tag_ids))
+    last_recipe_pk = get_max_pk(Recipe)
+    last_subscription_pk = get_max_pk(AuthorSubscription)
+
+    user_ids = create_users(rng, users, prefix, password, batch_size)
+    author_ids = user_ids[:]
+    rng.shuffle(author_ids)
+    author_weights = zipf_weights(len(author_ids))
+    recipe_ids = create_recipes(rng, recipes, author_ids, batch_size)
+
+    bulk_create_in_batches(IngredientRecipe, (
+        IngredientRecipe(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_id,
+            amount=rng.choice(AMOUNTS))
+        for recipe_id in recipe_ids
+        for ingredient_id in pick_distinct(
+            rng, ingredient_ids, ingredient_weights, rng.randint(3, 12))
+    ), batch_size)
+    bulk_create_in_batches(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in pick_distinct(
+            rng, tag_ids, tag_weights, rng.randint(1, 3))
+    ), batch_size)
+
+    popular_recipe_ids = recipe_ids[:]
+    rng.shuffle(popular_recipe_ids)
+    recipe_weights = zipf_weights(len(popular_recipe_ids))
+    created = {'users': len(user_ids), 'recipes': len(recipe_ids)}
+    for key, model, per_user in (('favorites', Favorite, favorites),
+                                 ('carts', ShoppingCart, carts)):
+        created[key] = bulk_create_in_batches(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in pick_distinct(
+                rng, popular_recipe_ids, recipe_weights,
+                rng.randint(0, 2 * per_user))
+        ), batch_size)
+    created['subscriptions'] = bulk_create_in_batches(AuthorSubscription, (
+        AuthorSubscription(subscriber_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in pick_distinct(
+            rng, author_ids, author_weights,
+            rng.randint(0, 2 * subscriptions))
+        if author_id != user_id
+    ), batch_size)
+
+    # bulk_create не отправляет сигналы: счётчики, поисковые векторы,
+    # суммы списков покупок и ленты подписок заполняем явно.
+    reconcile_counters()
+    rebuild_totals(user_ids)
+    update_search_vectors(Recipe.objects.filter(pk__gt=last_recipe_pk))
+    new_subscriptions = AuthorSubscription.objects.filter(
+        pk__gt=last_subscription_pk).select_related('subscriber', 'author')
+    for subscription in new_subscriptions.iterator():
+        backfill_subscription(subscription.subscriber, subscription.author)
+    return created
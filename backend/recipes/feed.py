@@ -0,0 +1,119 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from users.models import AuthorSubscription, CustomUser
+
+from .models import FeedEntry, Recipe
+
+
+def is_fanned_out(author):
+    return author.subscribers_count <= settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+def create_entries(entries):
+    """Записывает FeedEntry пачками по FEED_FANOUT_BATCH_SIZE."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.FEED_FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def get_subscriber_ids(author_id):
+    return AuthorSubscription.objects.filter(
+        author_id=author_id).values_list('subscriber_id', flat=True).iterator(
+        chunk_size=settings.FEED_FANOUT_BATCH_SIZE)
+
+
+def fan_out_recipe(recipe_id, author_id, date):
+    """Раскладывает новый рецепт по лентам подписчиков автора.
+
+    Для авторов с очень большим числом подписчиков рецепты в ленту не
+    пишутся, они добавляются при чтении (см. get_feed_page).
+    """
+    author = CustomUser.objects.filter(pk=author_id).first()
+    if author is None or not is_fanned_out(author):
+        return
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, date=date)
+        for user_id in get_subscriber_ids(author_id)
+    )
+
+
+def backfill_subscription(subscriber, author):
+    """Добавляет в ленту подписчика все рецепты автора."""
+    if not is_fanned_out(author):
+        return
+    recipes = Recipe.objects.filter(author=author).values_list(
+        'pk', 'date').iterator(chunk_size=settings.FEED_FANOUT_BATCH_SIZE)
+    create_entries(
+        FeedEntry(user=subscriber, recipe_id=recipe_id, date=date)
+        for recipe_id, date in recipes
+    )
+
+
+def fan_out_author(author_id):
+    """Раскладывает все рецепты автора по лентам всех его подписчиков.
+
+    Нужна, когда число подписчиков опускается до
+    FEED_FANOUT_MAX_FOLLOWERS: рецепты, опубликованные, пока автор
+    читался при чтении ленты, в ленты не записаны.
+    """
+    author = CustomUser.objects.filter(pk=author_id).first()
+    if author is None or not is_fanned_out(author):
+        return
+    recipes = list(Recipe.objects.filter(
+        author_id=author_id).values_list('pk', 'date'))
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, date=date)
+        for user_id in get_subscriber_ids(author_id)
+        for recipe_id, date in recipes
+    )
+
+
+def remove_subscription(subscriber, author):
+    FeedEntry.objects.filter(
+        user=subscriber, recipe__author=author).delete()
+
+
+def before(position, date_field, id_field):
+    """Условие «позже курсора» для сортировки (-date, -id)."""
+    if position is None:
+        return Q()
+    date, pk = position
+    return Q(**{f'{date_field}__lt': date}) | Q(
+        **{date_field: date, f'{id_field}__lt': pk})
+
+
+def get_feed_page(user, queryset, position, size):
+    """Рецепты ленты после курсора position = (date, id), не больше size.
+
+    Страница выбирается по индексу FeedEntry (user, -date, -recipe).
+    Рецепты авторов, которые не раскладываются по лентам, читаются
+    отдельным запросом с тем же курсором и LIMIT и сливаются с записями
+    ленты. queryset — рецепты с фильтрами списка, из него загружаются
+    рецепты страницы.
+    """
+    entries = FeedEntry.objects.filter(
+        before(position, 'date', 'recipe_id'), user=user)
+    if queryset.query.where:
+        # Заданы фильтры списка (tags, search и т. п.).
+        entries = entries.filter(recipe__in=queryset.values('pk'))
+    rows = list(entries.order_by('-date', '-recipe_id').values_list(
+        'date', 'recipe_id')[:size])
+    read_time_authors = list(AuthorSubscription.objects.filter(
+        subscriber=user,
+        author__subscribers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('author_id', flat=True))
+    if read_time_authors:
+        rows = sorted(set(rows).union(
+            queryset.filter(
+                before(position, 'date', 'id'),
+                author__in=read_time_authors
+            ).order_by('-date', '-id').values_list('date', 'id')[:size]
+        ), reverse=True)[:size]
+    recipes = queryset.in_bulk([recipe_id for _, recipe_id in rows])
+    return [recipes[recipe_id] for _, recipe_id in rows
+            if recipe_id in recipes]
@@ -1,16 +1,20 @@
 
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
-                                           ModelMultipleChoiceFilter)
+                                           FilterSet, MultipleChoiceFilter)
 
-from .models import Recipe, Tag
+from .catalog import get_tag_map
+from .models import IngredientRecipe, Recipe
+from .search import search_recipes
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_map()]
 
 
 class RecipeFilter(FilterSet):
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags',
     )
     author = CharFilter(
         field_name="author__id"
@@ -24,10 +28,25 @@ class RecipeFilter(FilterSet):
         method='filter_is_in_shopping_cart'
     )
     ingredients = CharFilter(
-        field_name='ingredients__name',
-        lookup_expr='icontains',
+        method='filter_ingredients'
+    )
+    search = CharFilter(
+        method='filter_search'
     )
 
+    def filter_tags(self, queryset, name, value):
+        tag_map = get_tag_map()
+        return queryset.filter(
+            tags__in=[tag_map[slug] for slug in value]
+        ).distinct()
+
+    def filter_ingredients(self, queryset, name, value):
+        return queryset.filter(pk__in=IngredientRecipe.objects.filter(
+            ingredient__name__icontains=value).values('recipe'))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value:
@@ -43,4 +62,4 @@ class RecipeFilter(FilterSet):
     class Meta:
         model = Recipe
         fields = ['tags', 'is_favorited',
-                  'is_in_shopping_cart', 'author', 'ingredients']
+                  'is_in_shopping_cart', 'author', 'ingredients', 'search']
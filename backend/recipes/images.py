@@ -0,0 +1,102 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Имя варианта: (размер, формат, обрезать ли под размер).
+VARIANTS = {
+    'card': ((480, 320), 'JPEG', True),
+    'card_webp': ((480, 320), 'WEBP', True),
+    'detail': ((1200, 800), 'JPEG', False),
+    'detail_webp': ((1200, 800), 'WEBP', False),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+VARIANTS_DIR = 'recipes/images/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='recipe-images'
+            )
+    return _executor
+
+
+def render_variant(image, size, image_format, crop):
+    if crop:
+        variant = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        variant = image.copy()
+        variant.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    variant.save(buffer, image_format, quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+def generate_variants(recipe_id, source):
+    from .models import Recipe
+
+    try:
+        with default_storage.open(source) as file:
+            image = Image.open(file)
+            image = ImageOps.exif_transpose(image).convert('RGB')
+        stem = os.path.splitext(os.path.basename(source))[0]
+        variants = {'source': source}
+        for name, (size, image_format, crop) in VARIANTS.items():
+            path = default_storage.save(
+                f'{VARIANTS_DIR}/{stem}_{name}.'
+                f'{EXTENSIONS[image_format]}',
+                ContentFile(render_variant(image, size, image_format, crop))
+            )
+            variants[name] = path
+        Recipe.objects.filter(pk=recipe_id, image=source).update(
+            image_variants=variants)
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить изображения рецепта %s', recipe_id)
+
+
+def generate_variants_in_worker(recipe_id, source):
+    close_old_connections()
+    try:
+        generate_variants(recipe_id, source)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(recipe):
+    if not recipe.image or (
+            recipe.image_variants.get('source') == recipe.image.name):
+        return
+    recipe_id, source = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(
+            generate_variants_in_worker, recipe_id, source))
+
+
+def get_variant_urls(recipe, request=None):
+    variants = recipe.image_variants or {}
+    if not recipe.image or variants.get('source') != recipe.image.name:
+        return {}
+    urls = {}
+    for name in VARIANTS:
+        if name in variants:
+            url = default_storage.url(variants[name])
+            urls[name] = (request.build_absolute_uri(url)
+                          if request is not None else url)
+    return urls
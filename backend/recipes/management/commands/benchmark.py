@@ -0,0 +1,114 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from recipes.benchmarks import (BenchmarkContext, BenchmarkError,
+                                ClientTransport, HttpTransport, compare,
+                                load_suites, run_case)
+from recipes.fake_data import FAKE_EMAIL, FAKE_PASSWORD
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Прогнать бенчмарки и сравнить с базовыми результатами. '
+            'Данные можно создать командой seed_fake_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'suites', nargs='*',
+            help='Наборы бенчмарков, по умолчанию все')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument(
+            '--url',
+            help='Адрес запущенного сервера; без него запросы идут через '
+                 'тестовый клиент Django')
+        parser.add_argument('--email', default=FAKE_EMAIL.format('user0'))
+        parser.add_argument('--password', default=FAKE_PASSWORD)
+        parser.add_argument('--baseline', default=BASELINE_PATH)
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результаты как новые базовые')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый относительный рост p95')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой при регрессии')
+
+    def handle(self, *args, **options):
+        suites = load_suites()
+        names = options['suites'] or list(suites)
+        unknown = set(names) - set(suites)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные наборы: {", ".join(sorted(unknown))}. '
+                f'Доступны: {", ".join(suites)}.')
+        if options['url']:
+            transport = HttpTransport(options['url'])
+        else:
+            transport = ClientTransport()
+        context = BenchmarkContext(
+            transport, options['email'], options['password'])
+        results = {}
+        try:
+            for name in names:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                results[name] = {}
+                for case in suites[name](context):
+                    stats = run_case(
+                        case, options['iterations'], options['warmup'],
+                        options['concurrency'])
+                    results[name][case.name] = stats
+                    info = ''.join(
+                        f'  {key} {value}'
+                        for key, value in (case.info or {}).items())
+                    self.stdout.write(
+                        f'  {case.name:<55} p50 {stats["p50"]:>8} '
+                        f'p95 {stats["p95"]:>8} p99 {stats["p99"]:>8} мс  '
+                        f'{stats["throughput"]:>8} rps  '
+                        f'запросов {stats["queries"]}{info}')
+        except BenchmarkError as error:
+            raise CommandError(error)
+
+        report = {
+            'meta': {
+                'transport': 'http' if options['url'] else 'client',
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'concurrency': options['concurrency'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            self.write_json(options['output'], report)
+        if options['save_baseline']:
+            self.write_json(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовые результаты записаны в {options["baseline"]}'))
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(f'Файл {options["baseline"]} не найден, '
+                              f'сравнение пропущено.')
+            return
+        with open(options['baseline'], encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, options['tolerance'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+            return
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(regression))
+        if options['fail_on_regression']:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def write_json(self, path, report):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+            file.write('\n')
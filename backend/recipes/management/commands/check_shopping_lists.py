@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.shopping_list import bump_cart_versions
+from recipes.shopping_totals import find_mismatched_users, rebuild_totals
+
+
+class Command(BaseCommand):
+    help = ('Сверить суммы списков покупок с корзинами и рецептами; '
+            'с --fix пересчитать расходящиеся списки')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересчитать списки пользователей с расхождениями')
+
+    def handle(self, *args, **options):
+        mismatched = find_mismatched_users()
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        for user_id, count in sorted(mismatched.items()):
+            self.stdout.write(
+                f'Пользователь {user_id}: расходится позиций: {count}')
+        if not options['fix']:
+            self.stdout.write(self.style.WARNING(
+                f'Списков с расхождениями: {len(mismatched)}. '
+                f'Запустите с --fix, чтобы пересчитать их.'))
+            return
+        with transaction.atomic():
+            rebuild_totals(mismatched)
+            bump_cart_versions(mismatched)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано списков: {len(mismatched)}.'))
@@ -1,30 +1,166 @@
 import csv
+import io
+import json
 import os
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from grocery_assistant.cache import is_cache_shared
+from recipes.catalog import bump_catalog_version
 from recipes.models import Ingredient
 
+HEADER = ('name', 'measurement_unit')
+STAGING_TABLE = 'ingredient_staging'
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) != 2 or tuple(row) == HEADER:
+            continue
+        yield row
+
+
+def read_json(file, chunk_size=64 * 1024):
+    # Потоковый разбор JSON-массива объектов без чтения файла целиком.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip(', \t\r\n')
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise CommandError('Ожидался JSON-массив ингредиентов.')
+            started = True
+            buffer = buffer[1:].lstrip(', \t\r\n')
+        if buffer.startswith(']'):
+            return
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise CommandError('Некорректный JSON-файл.')
+            else:
+                buffer = buffer[end:]
+                yield item['name'], item['measurement_unit']
+                continue
+        if eof:
+            return
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
-    help = 'Загрузить ингредиенты из файла CSV'
+    help = 'Загрузить ингредиенты из файла CSV или JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join('data', 'ingredients.csv'),
+            help='Путь к файлу с ингредиентами.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной пачке.'
+        )
 
     def handle(self, *args, **options):
-        # Жестко указываем путь к файлу CSV
-        csv_file_path = os.path.join(os.getcwd(), 'data', 'ingredients.csv')
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(
+                f'Файл {path} не найден. Укажите правильный путь.')
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format}. '
+                f'Укажите --format csv или --format json.')
 
-        if not os.path.exists(csv_file_path):
-            self.stderr.write(self.style.ERROR(
-                'Файл CSV не найден. Укажите правильный путь.'))
-            return
+        before = Ingredient.objects.count()
+        with open(path, encoding='utf-8') as file:
+            rows = (
+                (name.strip(), measurement_unit.strip())
+                for name, measurement_unit in READERS[file_format](file)
+                if name.strip()
+            )
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    processed = self.load_with_copy(rows, options)
+                else:
+                    processed = self.load_with_bulk_create(rows, options)
+        bump_catalog_version('ingredients')
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {processed}, '
+            f'добавлено ингредиентов: {created}.'))
+        if not is_cache_shared():
+            self.stdout.write(self.style.WARNING(
+                'Кэш Django не общий (не задан REDIS_URL): запущенные '
+                'серверы увидят изменения справочника только после '
+                'перезапуска.'))
+
+    def batches(self, rows, batch_size):
+        rows = iter(rows)
+        processed = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+            processed += len(batch)
+            self.stdout.write(f'Обработано строк: {processed}')
+
+    def load_with_bulk_create(self, rows, options):
+        processed = 0
+        for batch in self.batches(rows, options['batch_size']):
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in batch),
+                batch_size=options['batch_size'],
+                ignore_conflicts=True
+            )
+            processed += len(batch)
+        return processed
 
-        with open(csv_file_path, encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)  # Пропустить заголовок CSV-файла
-            for row in reader:
-                name, measurement_unit = row
-                ingredient = Ingredient.objects.create(
-                    name=name,
-                    measurement_unit=measurement_unit
+    def load_with_copy(self, rows, options):
+        table = Ingredient._meta.db_table
+        processed = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} '
+                f'(name varchar(200), measurement_unit varchar(100)) '
+                f'ON COMMIT DROP'
+            )
+            for batch in self.batches(rows, options['batch_size']):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                    f'FROM STDIN WITH (FORMAT csv)',
+                    buffer
                 )
-                self.stdout.write(self.style.SUCCESS(
-                    f'Загружен ингредиент: {ingredient.name}'))
+                processed += len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit '
+                f'FROM {STAGING_TABLE} '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+        return processed
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Подготовить уменьшенные копии фото для существующих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии даже если они уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True).values_list('pk', 'image', 'image_variants')
+        processed = 0
+        for pk, image, variants in list(recipes):
+            if not options['force'] and variants.get('source') == image:
+                continue
+            generate_variants(pk, image)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}'))
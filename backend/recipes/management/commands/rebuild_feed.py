@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from recipes.feed import backfill_subscription
+from users.models import AuthorSubscription
+
+
+class Command(BaseCommand):
+    help = 'Заполнить ленты подписок по существующим подпискам'
+
+    def handle(self, *args, **options):
+        subscriptions = AuthorSubscription.objects.select_related(
+            'subscriber', 'author')
+        processed = 0
+        for subscription in subscriptions.iterator():
+            backfill_subscription(subscription.subscriber, subscription.author)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано подписок: {processed}'))
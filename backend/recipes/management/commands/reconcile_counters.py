@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать счётчики избранного, корзин, рецептов и подписчиков'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {updated["recipes"]}, '
+            f'пользователей: {updated["users"]}.'))
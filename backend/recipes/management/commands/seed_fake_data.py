@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.fake_data import FAKE_PASSWORD, generate_fake_data
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Сгенерировать тестовые данные: пользователей, рецепты, подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число рецептов в избранном у пользователя')
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Среднее число рецептов в списке покупок у пользователя')
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок у пользователя')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prefix', default='user')
+        parser.add_argument('--password', default=FAKE_PASSWORD)
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError(
+                'Нет ингредиентов: сначала загрузите их командой csvloader.')
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        with transaction.atomic():
+            created = generate_fake_data(
+                users=options['users'],
+                recipes=options['recipes'],
+                favorites=options['favorites'],
+                carts=options['carts'],
+                subscriptions=options['subscriptions'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                prefix=options['prefix'],
+                password=options['password'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {created["users"]}, '
+            f'рецептов: {created["recipes"]}, '
+            f'избранного: {created["favorites"]}, '
+            f'в списках покупок: {created["carts"]}, '
+            f'подписок: {created["subscriptions"]}.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.search import is_full_text_supported, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать поисковые векторы рецептов'
+
+    def handle(self, *args, **options):
+        if not is_full_text_supported():
+            self.stdout.write(
+                'Полнотекстовый поиск доступен только в PostgreSQL.')
+            return
+        updated = update_search_vectors(Recipe.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}'))
@@ -0,0 +1,52 @@
+from django.utils.functional import cached_property
+from users.models import AuthorSubscription
+
+from .models import Favorite, ShoppingCart
+
+
+class MembershipResolver:
+    """Подписки, избранное и корзина текущего пользователя.
+
+    Каждое множество загружается одним запросом при первом обращении,
+    дальше флаги is_subscribed, is_favorited и is_in_shopping_cart
+    вычисляются без запросов к БД.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _ids(self, queryset, field):
+        if self.user.is_anonymous:
+            return frozenset()
+        return frozenset(queryset.values_list(field, flat=True))
+
+    @cached_property
+    def followed_author_ids(self):
+        return self._ids(
+            AuthorSubscription.objects.filter(subscriber=self.user),
+            'author_id')
+
+    @cached_property
+    def favorite_recipe_ids(self):
+        return self._ids(
+            Favorite.objects.filter(user=self.user), 'recipe_id')
+
+    @cached_property
+    def cart_recipe_ids(self):
+        return self._ids(
+            ShoppingCart.objects.filter(user=self.user), 'recipe_id')
+
+    def is_subscribed(self, author):
+        return author.pk in self.followed_author_ids
+
+    def is_favorited(self, recipe):
+        return recipe.pk in self.favorite_recipe_ids
+
+    def is_in_shopping_cart(self, recipe):
+        return recipe.pk in self.cart_recipe_ids
+
+
+def get_membership(context):
+    if 'membership' not in context:
+        context['membership'] = MembershipResolver(context['request'].user)
+    return context['membership']
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:23
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Сливает ингредиенты с одинаковыми названием и единицей в один.
+
+    Остаётся ингредиент с наименьшим id. Строки рецептов переводятся на
+    него; если в рецепте он уже есть, количества складываются. Таблица
+    итогов списков покупок создаётся позже (0008) и заполняется командой
+    check_shopping_lists --fix уже по слитым ингредиентам.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    groups = (
+        Ingredient.objects
+        .values('name', 'measurement_unit')
+        .annotate(keep_id=Min('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        keep_id = group['keep_id']
+        duplicate_ids = list(
+            Ingredient.objects
+            .filter(name=group['name'],
+                    measurement_unit=group['measurement_unit'])
+            .exclude(pk=keep_id)
+            .values_list('pk', flat=True)
+        )
+        rows = IngredientRecipe.objects.filter(
+            ingredient_id__in=duplicate_ids).order_by('pk')
+        for row in rows:
+            kept = IngredientRecipe.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=keep_id).first()
+            if kept is None:
+                row.ingredient_id = keep_id
+                row.save(update_fields=['ingredient'])
+            else:
+                kept.amount += row.amount
+                kept.save(update_fields=['amount'])
+                row.delete()
+        Ingredient.objects.filter(pk__in=duplicate_ids).delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # Отложенные проверки внешних ключей должны выполниться до
+        # ALTER TABLE в той же транзакции.
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:24
+
+import logging
+
+import django.contrib.postgres.search
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+# Индексы создаются только в PostgreSQL, на остальных СУБД поиск
+# выполняется через icontains.
+SEARCH_VECTOR_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)'
+)
+TRIGRAM_INDEXES_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_name_trgm '
+    'ON recipes_recipe USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (name gin_trgm_ops)',
+)
+DROP_INDEXES_SQL = (
+    'DROP INDEX IF EXISTS recipes_ingredient_name_trgm',
+    'DROP INDEX IF EXISTS recipes_recipe_name_trgm',
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(SEARCH_VECTOR_INDEX_SQL)
+    # Расширение pg_trgm может быть недоступно пользователю БД; поиск
+    # работает и без триграммных индексов.
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for statement in TRIGRAM_INDEXES_SQL:
+                schema_editor.execute(statement)
+    except DatabaseError as error:
+        logger.warning('Триграммные индексы не созданы: %s', error)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in DROP_INDEXES_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
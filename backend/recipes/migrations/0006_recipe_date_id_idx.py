@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-date', '-id'], name='recipe_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_dates(apps, schema_editor):
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry.objects.update(date=Subquery(
+        Recipe.objects.filter(pk=OuterRef('recipe_id')).values('date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedentry',
+            name='date',
+            field=models.DateField(null=True, verbose_name='Дата создания рецепта'),
+        ),
+        migrations.RunPython(fill_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feedentry',
+            name='date',
+            field=models.DateField(verbose_name='Дата создания рецепта'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-date', '-recipe'], name='feedentry_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .catalog import (CatalogCacheMiss, catalog_cache_only, get_catalog_entry,
+                      get_catalog_version)
+from .membership import MembershipResolver
+
+
+class CatalogCacheMixin:
+    """Условный GET и кэш готовых тел ответов для справочников.
+
+    ETag строится из версии справочника и ключа запроса, поэтому ответ
+    304 не требует ни обращения к БД, ни сериализации. Кэшируется только
+    JSON; другие форматы (например, ?format=api) отдаются обычным путём.
+    """
+    catalog = None
+
+    def catalog_response(self, request, key, build):
+        if request.accepted_renderer.format != 'json':
+            if catalog_cache_only.get():
+                raise CatalogCacheMiss(key)
+            return Response(build())
+        version = get_catalog_version(self.catalog)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        etag = f'"{self.catalog}-{version}-{digest}"'
+        # Слабое сравнение: сжатые ответы получают ETag вида W/"...".
+        known_etags = {
+            tag.removeprefix('W/') for tag in
+            parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))}
+        if etag in known_etags:
+            response = HttpResponse(status=304)
+        else:
+            body = get_catalog_entry(
+                self.catalog, digest,
+                lambda: self.render_catalog(build()))
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def render_catalog(self, data):
+        return api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.catalog_response(
+            request, f'list?{request.GET.urlencode()}',
+            lambda: super(CatalogCacheMixin, self).list(
+                request, *args, **kwargs).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.catalog_response(
+            request, f'detail:{lookup}',
+            lambda: super(CatalogCacheMixin, self).retrieve(
+                request, *args, **kwargs).data)
+
+
+class MembershipContextMixin:
+    """Добавляет в контекст сериализатора MembershipResolver запроса."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['membership'] = MembershipResolver(self.request.user)
+        return context
@@ -1,10 +1,15 @@
 from autoslug import AutoSlugField
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.db import models
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.utils.text import slugify
 from unidecode import unidecode
-from users.models import CustomUser
+from users.models import AuthorSubscription, CustomUser
 
 
 class Ingredient(models.Model):
@@ -21,6 +26,11 @@ class Ingredient(models.Model):
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
         ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_unit'
+            )]
 
     def __str__(self):
         return self.name
@@ -56,6 +66,61 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(AuthorSubscription.objects.filter(
+                subscriber=user, author=OuterRef('author'))),
+        )
+
+    @staticmethod
+    def read_prefetches():
+        return (
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient').order_by('pk')
+            ),
+        )
+
+    def for_reading(self, user, prefetch=True):
+        # Поисковый вектор нужен только фильтру search и в ответы не
+        # попадает.
+        queryset = self.select_related('author').defer(
+            'search_vector').with_user_flags(user)
+        if prefetch:
+            queryset = queryset.prefetch_related(*self.read_prefetches())
+        return queryset
+
+    def latest_per_author(self, limit):
+        # Django 3.2 не умеет фильтровать по оконным функциям, поэтому
+        # ранжированный запрос оборачивается в подзапрос вручную.
+        ranked = self.order_by().annotate(author_position=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('date').desc(), F('id').desc()],
+        )).values('id', 'author_position')
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.author_position <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         CustomUser,
@@ -73,6 +138,12 @@ class Recipe(models.Model):
         default=None,
         verbose_name='Фото'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии фото'
+    )
     date = models.DateField(
         verbose_name='Дата создания',
         auto_now_add=True
@@ -99,11 +170,32 @@ class Recipe(models.Model):
         related_name='recipes',
         verbose_name='Тэги'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлено в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлено в списки покупок'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-date', 'author']
+        indexes = [
+            models.Index(
+                fields=('-date', '-id'),
+                name='recipe_date_id_idx'
+            )]
         constraints = [
             models.UniqueConstraint(
                 fields=('author', 'name'),
@@ -113,12 +205,6 @@ class Recipe(models.Model):
     def __str__(self):
         return self.text
 
-    def is_favorited(self, user):
-        return self.favorites.filter(user=user).exists()
-
-    def is_in_shopping_cart(self, user):
-        return self.shopping_carts.filter(user=user).exists()
-
 
 class IngredientRecipe(models.Model):
     ingredient = models.ForeignKey(
@@ -206,3 +292,67 @@ class ShoppingCart(models.Model):
                 fields=('user', 'recipe',),
                 name='ShoppingCart'
             )]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    # Копия Recipe.date: лента читается по индексу (user, -date, -recipe)
+    # без обращения к таблице рецептов.
+    date = models.DateField(verbose_name='Дата создания рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        indexes = [
+            models.Index(
+                fields=('user', '-date', '-recipe'),
+                name='feedentry_user_date_idx'
+            )]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe',),
+                name='FeedEntry'
+            )]
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя.
+
+    Поддерживается приращениями (см. recipes.shopping_totals), сверяется
+    командой check_shopping_lists.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    # Не PositiveIntegerField: upsert с отрицательным приращением проверяет
+    # ограничения вставляемой строки. Строки с суммой <= 0 удаляются.
+    total_amount = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='ShoppingListItem'
+            )]
@@ -1,6 +1,144 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, PageNumberPagination,
+                                       _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .feed import get_feed_page
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (например, (date, id)) без COUNT и OFFSET.
+
+    Курсор хранит значения полей сортировки последнего объекта страницы,
+    следующая страница выбирается условием по этим значениям, поэтому
+    время ответа не зависит от глубины.
+    """
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор'
+
+    def __init__(self, ordering=None, page_size=None):
+        if ordering is not None:
+            self.ordering = ordering
+        self.page_size = page_size
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (BinasciiError, ValueError, TypeError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, name.lstrip('-')) for name in self.ordering]
+        return urlsafe_b64encode(
+            json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+    def get_position_filter(self, position):
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def get_page(self, queryset, position, size):
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        return list(queryset[:size])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        position = self.decode_cursor(request, queryset.model)
+        results = self.get_page(queryset, position, page_size + 1)
+        self.next_cursor = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_cursor = self.encode_cursor(results[-1])
+        return results
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(KeysetPagination):
+    """Лента подписок: страница выбирается по FeedEntry (см. get_feed_page),
+    курсор — (date, id) последнего рецепта."""
+    ordering = ('-date', '-id')
+
+    def get_page(self, queryset, position, size):
+        return get_feed_page(self.request.user, queryset, position, size)
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 100
+    keyset_ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (self.keyset_ordering is not None
+                and KeysetPagination.cursor_query_param
+                in request.query_params):
+            self.keyset = KeysetPagination(
+                self.keyset_ordering, self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(CustomPagination):
+    keyset_ordering = ('-date', '-id')
+
+
+class SubscriptionPagination(CustomPagination):
+    keyset_ordering = ('email', 'id')
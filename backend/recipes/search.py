@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, connections
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import IngredientRecipe, Recipe
+
+
+def is_full_text_supported(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def update_search_vectors(recipes):
+    if not is_full_text_supported():
+        return 0
+    config = settings.SEARCH_CONFIG
+    ingredient_names = Subquery(
+        IngredientRecipe.objects
+        .filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return recipes.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector('text', weight='B', config=config)
+        + SearchVector(
+            Coalesce(ingredient_names, Value('')),
+            weight='C', config=config)
+    ))
+
+
+def search_recipes(queryset, value):
+    """Рецепты по запросу value.
+
+    В PostgreSQL результаты упорядочены по релевантности. Если порядок
+    уже задан (?ordering= применяется раньше фильтров), он сохраняется,
+    а релевантность упорядочивает рецепты с равными значениями.
+    """
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by(*queryset.query.order_by, '-search_rank',
+                   *Recipe._meta.ordering)
+    return queryset.filter(
+        Q(name__icontains=value)
+        | Q(text__icontains=value)
+        | Q(pk__in=IngredientRecipe.objects.filter(
+            ingredient__name__icontains=value).values('recipe'))
+    )
@@ -1,17 +1,27 @@
 
 import webcolors
-from django.contrib.auth import authenticate
-from django.db.models import Count
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 from djoser.compat import get_user_email_field_name
 from djoser.conf import settings
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from users.models import AuthorSubscription, CustomUser
-
-from .models import Favorite, Ingredient, IngredientRecipe, Recipe, Tag
+from rest_framework.relations import MANY_RELATION_KWARGS
+from users.models import CustomUser
+
+from .images import get_variant_urls
+from .membership import get_membership
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     RecipeQuerySet, Tag)
+from .search import update_search_vectors
+from .shopping_list import bump_recipe_carts
+from .shopping_totals import change_recipe_totals, get_amount_deltas
 from .validators import validate_ingredients, validate_tags
 
+BULK_MAX_RECIPES = 100
+
 
 class Hex2NameColor(serializers.Field):
     def to_representation(self, value):
@@ -25,6 +35,42 @@ class Hex2NameColor(serializers.Field):
         return data
 
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        pks = []
+        for pk in data:
+            if isinstance(pk, bool):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+            try:
+                pks.append(int(pk))
+            except (TypeError, ValueError):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+        objects = child.get_queryset().in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который при many=True проверяет все
+    значения одним запросом."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -68,25 +114,41 @@ class CustomTokenCreateSerializer(serializers.Serializer):
         self.fields[self.email_field] = serializers.EmailField()
 
     def validate(self, attrs):
+        """Один запрос пользователя и одно вычисление хэша на попытку.
+
+        Для неизвестной почты хэш считается впустую, чтобы время ответа не
+        выдавало, зарегистрирован ли адрес. check_password сам перехэширует
+        пароль, если сменился хэшер или число итераций.
+        """
         password = attrs.get("password")
-        email = attrs.get("email")
-        self.user = authenticate(
-            request=self.context.get("request"), email=email, password=password
-        )
-        if not self.user:
-            self.user = CustomUser.objects.filter(email=email).first()
-            if self.user and not self.user.check_password(password):
-                self.fail("invalid_credentials")
-        if self.user and self.user.is_active:
-            return attrs
-        self.fail("invalid_account")
+        user = CustomUser.objects.filter(email=attrs.get("email")).first()
+        if user is None:
+            make_password(password)
+            self.fail("invalid_credentials")
+        if not user.check_password(password):
+            self.fail("invalid_credentials")
+        if not user.is_active:
+            self.fail("inactive_account")
+        self.user = user
+        return attrs
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return get_variant_urls(recipe, self.context.get('request'))
 
 
 class RecipeFavoriteSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_variants', 'cooking_time']
 
 
 class CustomUserSerializer(UserSerializer):
@@ -101,20 +163,15 @@ class CustomUserSerializer(UserSerializer):
         }
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        elif hasattr(user, 'email'):
-            return AuthorSubscription.objects.filter(
-                subscriber=user,
-                author=obj
-            ).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_membership(self.context).is_subscribed(obj)
 
 
 class SubscribeUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = RecipeFavoriteSerializer(many=True)
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CustomUser
@@ -122,33 +179,13 @@ class SubscribeUserSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-
-        return obj.subscribers.filter(subscriber=user).exists()
-
-    def get_recipes_count(self, obj):
-        recipe_count = obj.recipes.aggregate(Count("id"))
-        return recipe_count["id__count"]
-
-    def to_representation(self, instance):
-
-        data = super().to_representation(instance)
-        recipes_limit = self.context.get(
-            'request').query_params.get('recipes_limit')
-
-        if recipes_limit:
-            recipes_limit = int(recipes_limit)
-            data['recipes'] = data['recipes'][:recipes_limit]
-
-        return data
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_membership(self.context).is_subscribed(obj)
 
 
 class RecipeCreateIngridientsSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(source='ingredient_id')
     name = serializers.CharField(
         read_only=True,
         source='ingredient.name'
@@ -167,11 +204,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         many=True,
         source='recipe_ingredients'
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -186,6 +224,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                   'is_in_shopping_cart',
                   'name',
                   'image',
+                  'image_variants',
                   'text',
                   'cooking_time'
                   )
@@ -196,6 +235,14 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
     def validate_ingredients(self, data):
         validate_ingredients(self, data)
+        ingredient_ids = {item['ingredient_id'] for item in data}
+        existing_ids = set(Ingredient.objects.filter(
+            pk__in=ingredient_ids).values_list('pk', flat=True))
+        missing_ids = ingredient_ids - existing_ids
+        if missing_ids:
+            raise serializers.ValidationError(
+                f'Ингредиенты не существуют: '
+                f'{", ".join(map(str, sorted(missing_ids)))}')
         return data
 
     def validate(self, data):
@@ -207,63 +254,202 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 'Редактировать рецепт может только автор')
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients')
         tags_data = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
-        for ingredient_data in ingredients_data:
-            IngredientRecipe.objects.create(
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
                 recipe=recipe,
-                ingredient_id=ingredient_data['id'].id,
+                ingredient_id=ingredient_data['ingredient_id'],
                 amount=ingredient_data['amount']
             )
+            for ingredient_data in ingredients_data
+        )
         recipe.tags.set(tags_data)
-
-        recipe.save()
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         tags_data = validated_data.pop('tags', None)
         ingredients_data = validated_data.pop('recipe_ingredients', None)
-
-        recipe.name = validated_data.get('name', recipe.name)
-        recipe.text = validated_data.get('text', recipe.text)
-        recipe.image = validated_data.get('image', recipe.image)
-        if tags_data is not None:
-            recipe.tags.set(tags_data)
-        else:
+        if tags_data is None:
             raise serializers.ValidationError('Поле tags обязательно')
-        if ingredients_data is not None:
-            recipe.recipe_ingredients.all().delete()
-            for ingredient_data in ingredients_data:
-                IngredientRecipe.objects.create(
-                    recipe=recipe,
-                    ingredient_id=ingredient_data['id'].id,
-                    amount=ingredient_data['amount']
-                )
-        else:
+        if ingredients_data is None:
             raise serializers.ValidationError('Поле ingredients обязательно')
-        recipe.save()
+
+        recipe = super().update(recipe, validated_data)
+        recipe.tags.set(tags_data)
+        self.update_ingredients(recipe, ingredients_data)
+        bump_recipe_carts(recipe.pk)
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
         return recipe
 
-    def to_representation(self, instance):
+    def update_ingredients(self, recipe, ingredients_data):
+        amounts = {
+            ingredient_data['ingredient_id']: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+        new_amounts = dict(amounts)
+        removed_ids = []
+        changed_rows = []
+        old_amounts = {}
+        for row in recipe.recipe_ingredients.all():
+            old_amounts[row.ingredient_id] = row.amount
+            amount = amounts.pop(row.ingredient_id, None)
+            if amount is None:
+                removed_ids.append(row.pk)
+            elif amount != row.amount:
+                row.amount = amount
+                changed_rows.append(row)
+        if removed_ids:
+            IngredientRecipe.objects.filter(pk__in=removed_ids).delete()
+        if changed_rows:
+            IngredientRecipe.objects.bulk_update(changed_rows, ['amount'])
+        if amounts:
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+                for ingredient_id, amount in amounts.items()
+            )
+        change_recipe_totals(
+            recipe.pk, get_amount_deltas(old_amounts, new_amounts))
 
+    def to_representation(self, instance):
+        if 'recipe_ingredients' not in getattr(
+                instance, '_prefetched_objects_cache', {}):
+            prefetch_related_objects(
+                [instance], *RecipeQuerySet.read_prefetches())
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
         data = super().to_representation(instance)
         tags_data = TagSerializer(instance.tags.all(), many=True).data
         data['tags'] = tags_data
         return data
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.favorites.filter(user=user).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return get_membership(self.context).is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.shopping_cart.filter(user=user).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return get_membership(self.context).is_in_shopping_cart(obj)
+
+
+def get_recipe_relations(recipe_ids):
+    """Теги и ингредиенты рецептов в виде готовых словарей.
+
+    Два запроса values_list вместо prefetch_related: модели тегов,
+    ингредиентов и строк IngredientRecipe не создаются.
+    """
+    tags = {recipe_id: [] for recipe_id in recipe_ids}
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    if not recipe_ids:
+        return tags, ingredients
+    tag_rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids).order_by('tag__name', 'tag_id').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug')
+    for recipe_id, tag_id, name, color, slug in tag_rows:
+        tags[recipe_id].append(
+            {'id': tag_id, 'name': name, 'color': color, 'slug': slug})
+    ingredient_rows = IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids).order_by('pk').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount')
+    for recipe_id, ingredient_id, name, unit, amount in ingredient_rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return tags, ingredients
+
+
+class RecipeReadListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        tags, ingredients = get_recipe_relations(
+            [recipe.pk for recipe in recipes])
+        return [
+            self.child.build(recipe, tags[recipe.pk], ingredients[recipe.pk])
+            for recipe in recipes
+        ]
+
+
+class RecipeReadSerializer(serializers.BaseSerializer):
+    """Рецепты для list, retrieve и feed без полей DRF.
+
+    Ответ совпадает с RecipeCreateSerializer байт в байт, но собирается
+    обычными словарями; теги и ингредиенты загружаются одним запросом на
+    страницу (см. get_recipe_relations). Ожидает рецепты из
+    Recipe.objects.for_reading(user, prefetch=False).
+    """
+
+    class Meta:
+        list_serializer_class = RecipeReadListSerializer
+
+    def to_representation(self, recipe):
+        tags, ingredients = get_recipe_relations([recipe.pk])
+        return self.build(recipe, tags[recipe.pk], ingredients[recipe.pk])
+
+    def build(self, recipe, tags, ingredients):
+        author = recipe.author
+        return {
+            'id': recipe.pk,
+            'tags': tags,
+            'author': {
+                'email': author.email,
+                'id': author.pk,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': self.get_is_subscribed(recipe),
+            },
+            'ingredients': ingredients,
+            'is_favorited': self.get_flag(recipe, 'is_favorited'),
+            'is_in_shopping_cart': self.get_flag(
+                recipe, 'is_in_shopping_cart'),
+            'name': recipe.name,
+            'image': self.get_image_url(recipe),
+            'image_variants': get_variant_urls(
+                recipe, self.context.get('request')),
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+
+    def get_flag(self, recipe, name):
+        if hasattr(recipe, name):
+            return getattr(recipe, name)
+        return getattr(get_membership(self.context), name)(recipe)
+
+    def get_is_subscribed(self, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            return recipe.author_is_subscribed
+        return get_membership(self.context).is_subscribed(recipe.author)
+
+    def get_image_url(self, recipe):
+        if not recipe.image:
+            return None
+        url = recipe.image.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_RECIPES
+    )
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
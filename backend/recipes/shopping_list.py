@@ -0,0 +1,247 @@
+import csv
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from grocery_assistant.renderers import ORJSONRenderer
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import BaseRenderer
+from users.models import CustomUser
+
+from .catalog import get_catalog_version
+from .models import ShoppingCart, ShoppingListItem
+from .units import aggregate, format_amount
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+except ImportError:
+    pdfmetrics = None
+
+logger = logging.getLogger(__name__)
+
+SHOPPING_LIST_FILE_NAME = 'ingredients_list.{}'
+HEADER = 'Ингридиенты\tКоличество\tЕдиница измерения\n'
+COLUMNS = ('Ингредиент', 'Количество', 'Единица измерения')
+# Номер формата меняется вместе с содержимым файлов, чтобы после
+# обновления не отдавались закэшированные файлы старого формата.
+FILE_KEY = 'shopping_list:v2:{}:{}:{}:{}'
+PDF_FONT_NAME = 'ShoppingListFont'
+
+_pdf_executor = None
+_pdf_lock = threading.Lock()
+_pdf_font = None
+
+
+class ShoppingListBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Список покупок сейчас не удалось подготовить'
+    default_code = 'shopping_list_busy'
+
+
+def get_cart_version(user_id):
+    return CustomUser.objects.filter(pk=user_id).values_list(
+        'shopping_cart_version', flat=True).first()
+
+
+def bump_cart_versions(user_ids):
+    """Сбрасывает закэшированные списки покупок пользователей.
+
+    Версия хранится в строке пользователя и меняется в той же транзакции,
+    что и корзина, поэтому все воркеры видят её одинаково и не путают
+    списки даже без общего кэша.
+    """
+    CustomUser.objects.filter(pk__in=set(user_ids)).update(
+        shopping_cart_version=F('shopping_cart_version') + 1)
+
+
+def bump_recipe_carts(recipe_id):
+    """Сбрасывает списки покупок всех, у кого рецепт в корзине."""
+    CustomUser.objects.filter(
+        pk__in=ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values('user_id')
+    ).update(shopping_cart_version=F('shopping_cart_version') + 1)
+
+
+def get_ingredient_totals(user):
+    return (
+        ShoppingListItem.objects
+        .filter(user=user)
+        .values('ingredient__name', 'ingredient__measurement_unit',
+                'total_amount')
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def get_lines(totals):
+    """Строки списка покупок с приведёнными единицами."""
+    return aggregate(
+        (item['ingredient__name'], item['total_amount'],
+         item['ingredient__measurement_unit'])
+        for item in totals.iterator()
+    )
+
+
+def get_shopping_list_data(totals):
+    return [
+        {'name': line.name, 'amount': line.amount,
+         'measurement_unit': line.unit}
+        for line in get_lines(totals)
+    ]
+
+
+def get_rows(totals):
+    return [
+        (line.name.capitalize(), format_amount(line.amount), line.unit)
+        for line in get_lines(totals)
+    ]
+
+
+def iter_txt_lines(totals):
+    yield HEADER
+    for name, amount, unit in get_rows(totals):
+        yield f'{name}\t{amount}\t{unit}\n'
+
+
+def render_txt(totals):
+    return ''.join(iter_txt_lines(totals)).encode()
+
+
+def render_csv(totals):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    writer.writerows(get_rows(totals))
+    # BOM нужен Excel, чтобы открыть файл в UTF-8.
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def render_json(totals):
+    return ORJSONRenderer().render(get_shopping_list_data(totals))
+
+
+def get_pdf_font():
+    global _pdf_font
+    with _pdf_lock:
+        if _pdf_font is None:
+            path = settings.SHOPPING_LIST_PDF_FONT
+            if os.path.exists(path):
+                pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+                _pdf_font = PDF_FONT_NAME
+            else:
+                logger.warning(
+                    'Шрифт %s не найден, кириллица в PDF не отобразится',
+                    path)
+                _pdf_font = 'Helvetica'
+    return _pdf_font
+
+
+def build_pdf(rows):
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=A4, title='Список покупок')
+    table = Table([COLUMNS, *rows], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), get_pdf_font()),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+    ]))
+    document.build([table])
+    return buffer.getvalue()
+
+
+def get_pdf_executor():
+    global _pdf_executor
+    with _pdf_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ThreadPoolExecutor(
+                max_workers=settings.SHOPPING_LIST_PDF_WORKERS,
+                thread_name_prefix='shopping-list-pdf'
+            )
+    return _pdf_executor
+
+
+def render_pdf(totals):
+    """PDF строится в отдельном ограниченном пуле потоков, чтобы
+    одновременные выгрузки не занимали больше SHOPPING_LIST_PDF_WORKERS
+    потоков; запрос к БД выполняется в потоке запроса."""
+    future = get_pdf_executor().submit(build_pdf, get_rows(totals))
+    try:
+        return future.result(timeout=settings.SHOPPING_LIST_PDF_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise ShoppingListBusy()
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Выбирает формат выгрузки по ?format= или Accept.
+
+    Тело файла готовит get_shopping_list_file, рендерер только отдаёт
+    байты; ответы об ошибках кодируются в JSON.
+    """
+    charset = 'utf-8'
+    build = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return ORJSONRenderer().render(data)
+
+
+class TxtRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    build = staticmethod(render_txt)
+
+
+class CsvRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    build = staticmethod(render_csv)
+
+
+class PdfRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    build = staticmethod(render_pdf)
+
+
+class JsonRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    build = staticmethod(render_json)
+
+
+SHOPPING_LIST_RENDERERS = [TxtRenderer, CsvRenderer, JsonRenderer]
+if pdfmetrics is not None:
+    SHOPPING_LIST_RENDERERS.insert(2, PdfRenderer)
+
+
+def get_shopping_list_file(user, renderer):
+    """Файл списка покупок, закэшированный до изменения корзины.
+
+    Ключ включает версию корзины пользователя и версию справочника
+    ингредиентов, поэтому повторная выгрузка делает один запрос версии.
+    Версия читается раньше сумм: файл, собранный после изменения
+    корзины, может попасть под старую версию, но не наоборот.
+    """
+    key = FILE_KEY.format(
+        user.pk, get_cart_version(user.pk),
+        get_catalog_version('ingredients'), renderer.format)
+    content = cache.get(key)
+    if content is None:
+        content = renderer.build(get_ingredient_totals(user))
+        cache.set(key, content, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return content
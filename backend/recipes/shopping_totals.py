@@ -0,0 +1,162 @@
+"""Материализованные суммы списков покупок (ShoppingListItem).
+
+Суммы меняются приращениями: при добавлении рецепта в корзину и удалении
+из неё, при правке ингредиентов рецепта и перед удалением рецепта.
+Приращения применяются одним upsert (INSERT ... ON CONFLICT DO UPDATE),
+что поддерживают PostgreSQL и SQLite 3.24+.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from itertools import islice
+
+from django.db import connection
+from django.db.models import Sum
+
+from .models import IngredientRecipe, ShoppingCart, ShoppingListItem
+
+UPSERT_BATCH_SIZE = 300
+
+# Рецепты, которые сейчас удаляются: их вклад вычитается в pre_delete,
+# пока строки IngredientRecipe ещё на месте, а каскадное удаление корзин
+# уже ничего не меняет.
+deleting_recipe_ids = ContextVar('deleting_recipe_ids', default=frozenset())
+
+
+def get_recipe_amounts(recipe_ids):
+    return dict(
+        IngredientRecipe.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+    )
+
+
+def get_upsert_sql(rows_count):
+    meta = ShoppingListItem._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    user, ingredient, total = (
+        quote(meta.get_field(name).column)
+        for name in ('user', 'ingredient', 'total_amount'))
+    values = ', '.join(['(%s, %s, %s)'] * rows_count)
+    return (
+        f'INSERT INTO {table} ({user}, {ingredient}, {total}) '
+        f'VALUES {values} '
+        f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+        f'SET {total} = {table}.{total} + excluded.{total}'
+    )
+
+
+def apply_deltas(rows):
+    """Прибавляет к суммам приращения из (user_id, ingredient_id, delta)."""
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, UPSERT_BATCH_SIZE))
+            if not batch:
+                return
+            cursor.execute(
+                get_upsert_sql(len(batch)),
+                [value for row in batch for value in row])
+
+
+def change_cart_totals(user_id, recipe_ids, sign):
+    """Рецепты добавлены в корзину (sign=1) или убраны из неё (sign=-1)."""
+    recipe_ids = set(recipe_ids) - deleting_recipe_ids.get()
+    if not recipe_ids:
+        return
+    amounts = get_recipe_amounts(recipe_ids)
+    apply_deltas(
+        (user_id, ingredient_id, sign * amount)
+        for ingredient_id, amount in amounts.items())
+    if sign < 0:
+        ShoppingListItem.objects.filter(
+            user_id=user_id, total_amount__lte=0).delete()
+
+
+def change_recipe_totals(recipe_id, deltas):
+    """Ингредиенты рецепта изменились: deltas — ingredient_id -> разница
+    количества. Суммы меняются у всех, у кого рецепт в корзине."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True)
+    apply_deltas(
+        (user_id, ingredient_id, delta)
+        for user_id in user_ids.iterator()
+        for ingredient_id, delta in deltas.items())
+    decreased = [pk for pk, delta in deltas.items() if delta < 0]
+    if decreased:
+        ShoppingListItem.objects.filter(
+            ingredient_id__in=decreased, total_amount__lte=0).delete()
+
+
+def get_amount_deltas(old_amounts, new_amounts):
+    return {
+        ingredient_id: new_amounts.get(ingredient_id, 0)
+        - old_amounts.get(ingredient_id, 0)
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+
+
+def start_recipe_deletion(recipe_id):
+    change_recipe_totals(recipe_id, {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts([recipe_id]).items()
+    })
+    deleting_recipe_ids.set(deleting_recipe_ids.get() | {recipe_id})
+
+
+def finish_recipe_deletion(recipe_id):
+    deleting_recipe_ids.set(deleting_recipe_ids.get() - {recipe_id})
+
+
+def get_expected_totals(user_ids=None):
+    """Суммы, посчитанные заново по корзинам и рецептам."""
+    if user_ids is None:
+        lookup = {'recipe__shopping_cart__isnull': False}
+    else:
+        lookup = {'recipe__shopping_cart__user_id__in': user_ids}
+    rows = (
+        IngredientRecipe.objects
+        .filter(**lookup)
+        .order_by()
+        .values('recipe__shopping_cart__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('recipe__shopping_cart__user_id', 'ingredient_id',
+                     'total')
+    )
+    return {(user_id, ingredient_id): total
+            for user_id, ingredient_id, total in rows.iterator()}
+
+
+def find_mismatched_users():
+    expected = get_expected_totals()
+    actual = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in ShoppingListItem.objects
+        .values_list('user_id', 'ingredient_id', 'total_amount').iterator()
+    }
+    mismatched = defaultdict(int)
+    for key in expected.keys() | actual.keys():
+        if expected.get(key) != actual.get(key):
+            mismatched[key[0]] += 1
+    return dict(mismatched)
+
+
+def rebuild_totals(user_ids=None, batch_size=1000):
+    """Пересчитывает суммы пользователей (всех, если user_ids не задан)."""
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, total_amount=total)
+         for (user_id, ingredient_id), total
+         in get_expected_totals(user_ids).items()),
+        batch_size=batch_size
+    )
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from users.models import AuthorSubscription, CustomUser
+
+from .catalog import bump_catalog_version
+from .counters import change_counter
+from .feed import fan_out_author, fan_out_recipe
+from .images import schedule_variants
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .shopping_totals import finish_recipe_deletion, start_recipe_deletion
+from .user_recipes import recipes_changed
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_catalog_version('ingredients')
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_catalog_version('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counter(CustomUser, instance.author_id, 'recipes_count', 1)
+        recipe_id, author_id, date = (
+            instance.pk, instance.author_id, instance.date)
+        transaction.on_commit(
+            lambda: fan_out_recipe(recipe_id, author_id, date))
+    schedule_variants(instance)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_pre_delete(sender, instance, **kwargs):
+    start_recipe_deletion(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(CustomUser, instance.author_id, 'recipes_count', -1)
+    finish_recipe_deletion(instance.pk)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def user_recipe_created(sender, instance, created, **kwargs):
+    if created:
+        recipes_changed(sender, instance.user_id, [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def user_recipe_deleted(sender, instance, **kwargs):
+    recipes_changed(sender, instance.user_id, [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=AuthorSubscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            CustomUser, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=AuthorSubscription)
+def subscription_deleted(sender, instance, **kwargs):
+    author_id = instance.author_id
+    if change_counter(CustomUser, author_id, 'subscribers_count', -1) and (
+        CustomUser.objects.filter(
+            pk=author_id,
+            subscribers_count=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).exists()
+    ):
+        # Автор снова раскладывается по лентам: дописываем рецепты,
+        # которые читались при чтении ленты.
+        transaction.on_commit(lambda: fan_out_author(author_id))
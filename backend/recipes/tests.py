@@ -0,0 +1,75 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+from .models import FeedEntry, Recipe
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        self.author = self.create_user('author')
+        self.reader = self.create_user('reader')
+
+    def create_user(self, username):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='fake-password', first_name=username,
+            last_name=username)
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def publish(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [
+                Recipe.objects.create(
+                    author=self.author, name=f'Рецепт {number}',
+                    text='Описание', cooking_time=10).pk
+                for number in range(count)
+            ]
+
+    def subscribe(self, user, method='post'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.get_client(user), method)(
+                f'/api/users/{self.author.pk}/subscribe/')
+        self.assertIn(response.status_code, (201, 204))
+
+    def get_feed_ids(self, user):
+        client = self.get_client(user)
+        url = '/api/recipes/feed/?limit=4'
+        ids = []
+        while url:
+            data = client.get(url).json()
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+        return ids
+
+    @override_settings(FEED_FANOUT_BATCH_SIZE=3)
+    def test_subscription_backfills_full_history(self):
+        recipe_ids = self.publish(10)
+
+        self.subscribe(self.reader)
+
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 10)
+        self.assertEqual(
+            self.get_feed_ids(self.reader), sorted(recipe_ids, reverse=True))
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_is_fanned_out_again_below_threshold(self):
+        other = self.create_user('other')
+        self.subscribe(self.reader)
+        self.subscribe(other)
+        recipe_ids = self.publish(3)
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+        self.subscribe(other, method='delete')
+
+        self.assertEqual(
+            sorted(FeedEntry.objects.filter(user=self.reader).values_list(
+                'recipe_id', flat=True)), recipe_ids)
+        self.assertEqual(
+            self.get_feed_ids(self.reader), sorted(recipe_ids, reverse=True))
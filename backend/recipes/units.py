@@ -0,0 +1,122 @@
+"""Приведение единиц измерения и сведение списка покупок.
+
+В справочнике один и тот же продукт бывает в разных единицах (г и кг,
+мл, л и ложки). aggregate за один проход переводит количества в базовую
+единицу семейства, складывает их по продукту и выбирает единицу для
+вывода. Единицы разных семейств (граммы и ложки) не смешиваются:
+без плотности продукта их не перевести друг в друга.
+"""
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# Единица: (семейство, множитель к базовой единице семейства).
+UNITS = {
+    'г': ('mass', 1),
+    'кг': ('mass', 1000),
+    'мл': ('volume', 1),
+    'л': ('volume', 1000),
+    'стакан': ('volume', 250),
+    'ст. л.': ('volume', 15),
+    'ч. л.': ('volume', 5),
+    'капля': ('volume', 0.05),
+}
+# Единицы для вывода, от крупной к мелкой.
+DISPLAY_UNITS = {
+    'mass': (('кг', 1000), ('г', 1)),
+    'volume': (('л', 1000), ('мл', 1)),
+}
+METRIC_UNITS = frozenset(
+    unit for units in DISPLAY_UNITS.values() for unit, _ in units)
+TASTE_UNITS = frozenset(('по вкусу',))
+# Написания без пробелов -> единица из справочника.
+ALIASES = {
+    'гр': 'г', 'гр.': 'г', 'г.': 'г', 'грамм': 'г', 'граммов': 'г',
+    'кг.': 'кг', 'килограмм': 'кг',
+    'мл.': 'мл', 'миллилитр': 'мл', 'миллилитров': 'мл',
+    'л.': 'л', 'литр': 'л', 'литра': 'л', 'литров': 'л',
+    'ст.л.': 'ст. л.', 'стл': 'ст. л.', 'столоваяложка': 'ст. л.',
+    'ч.л.': 'ч. л.', 'чл': 'ч. л.', 'чайнаяложка': 'ч. л.',
+    'стак.': 'стакан', 'шт': 'шт.', 'штука': 'шт.', 'штук': 'шт.',
+    'повкусу': 'по вкусу',
+}
+
+
+class ShoppingListLine(NamedTuple):
+    name: str
+    # None для единиц вроде «по вкусу».
+    amount: Optional[float]
+    unit: str
+
+
+@lru_cache(maxsize=1024)
+def normalize_unit(unit):
+    unit = ' '.join(unit.lower().split())
+    return ALIASES.get(unit.replace(' ', ''), unit)
+
+
+@lru_cache(maxsize=1024)
+def get_unit_info(unit):
+    """(единица из справочника, семейство, множитель). Непереводимые
+    единицы образуют семейство из одной единицы."""
+    unit = normalize_unit(unit)
+    family, factor = UNITS.get(unit, (unit, 1))
+    return unit, family, factor
+
+
+def round_amount(amount):
+    amount = round(amount, 2)
+    return int(amount) if float(amount).is_integer() else amount
+
+
+def get_display(family, unit, base_amount):
+    """Количество и единица для вывода.
+
+    Если продукт записан в одной единице и она не метрическая (ложки,
+    стаканы, штуки), она сохраняется; иначе выбирается наибольшая
+    метрическая единица, в которой количество не меньше 1.
+    """
+    if unit is not None and unit not in METRIC_UNITS:
+        return base_amount / UNITS.get(unit, (family, 1))[1], unit
+    display_units = DISPLAY_UNITS[family]
+    for display_unit, factor in display_units:
+        if base_amount >= factor:
+            return base_amount / factor, display_unit
+    display_unit, factor = display_units[-1]
+    return base_amount / factor, display_unit
+
+
+def aggregate(rows):
+    """Сводит строки (название, количество, единица) в список покупок.
+
+    Строки одного продукта (без учёта регистра) в единицах одного
+    семейства складываются. Возвращает ShoppingListLine, отсортированные
+    по названию и единице.
+    """
+    groups = {}
+    for name, amount, unit in rows:
+        unit, family, factor = get_unit_info(unit)
+        key = (name.lower(), family)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [name, amount * factor, unit]
+        else:
+            group[1] += amount * factor
+            if group[2] != unit:
+                group[2] = None
+    lines = []
+    for (_, family), (name, base_amount, unit) in groups.items():
+        if unit in TASTE_UNITS:
+            lines.append(ShoppingListLine(name, None, unit))
+            continue
+        amount, unit = get_display(family, unit, base_amount)
+        lines.append(ShoppingListLine(name, round_amount(amount), unit))
+    lines.sort(key=lambda line: (line.name.lower(), line.unit))
+    return lines
+
+
+def format_amount(amount):
+    if amount is None:
+        return ''
+    if isinstance(amount, int):
+        return str(amount)
+    return f'{amount:.2f}'.rstrip('0').rstrip('.').replace('.', ',')
@@ -0,0 +1,81 @@
+"""Избранное и список покупок: изменения сразу для нескольких рецептов.
+
+Массовые операции обходят сигналы модели, поэтому счётчики рецептов,
+суммы списка покупок и версию корзины обновляют сами через
+recipes_changed, как и обработчики сигналов для одиночных изменений.
+INSERT ... ON CONFLICT и DELETE ... RETURNING поддерживают PostgreSQL и
+SQLite 3.35+.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .counters import change_counters
+from .models import Favorite, Recipe, ShoppingCart
+from .shopping_list import bump_cart_versions
+from .shopping_totals import change_cart_totals
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def recipes_changed(model, user_id, recipe_ids, delta):
+    if not recipe_ids:
+        return
+    change_counters(Recipe, recipe_ids, COUNTER_FIELDS[model], delta)
+    if model is ShoppingCart:
+        change_cart_totals(user_id, recipe_ids, delta)
+        bump_cart_versions([user_id])
+
+
+def get_columns(model):
+    meta = model._meta
+    quote = connection.ops.quote_name
+    return (quote(meta.db_table), *(
+        quote(meta.get_field(name).column)
+        for name in ('user', 'recipe', 'created_at')))
+
+
+def add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты и возвращает множество действительно добавленных.
+
+    Добавленные рецепты берутся из RETURNING, а не из предварительного
+    чтения: при параллельном добавлении того же рецепта строку вставит и
+    посчитает только один запрос.
+    """
+    if not recipe_ids:
+        return set()
+    table, user_column, recipe, created_at = get_columns(model)
+    values = ', '.join(['(%s, %s, %s)'] * len(recipe_ids))
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {recipe}, {created_at}) '
+            f'VALUES {values} '
+            f'ON CONFLICT ({user_column}, {recipe}) DO NOTHING '
+            f'RETURNING {recipe}',
+            [value for pk in recipe_ids for value in (user.pk, pk, now)])
+        added = [row[0] for row in cursor.fetchall()]
+    recipes_changed(model, user.pk, added, 1)
+    return set(added)
+
+
+def remove_recipes(model, user, recipe_ids):
+    """Удаляет рецепты и возвращает множество действительно удалённых.
+
+    Удаление идёт одним DELETE ... RETURNING без сигналов по каждой
+    строке, счётчики и суммы обновляются по удалённым строкам.
+    """
+    if not recipe_ids:
+        return set()
+    table, user_column, recipe, _ = get_columns(model)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {recipe} IN ({placeholders}) RETURNING {recipe}',
+            [user.pk, *recipe_ids])
+        removed = [row[0] for row in cursor.fetchall()]
+    recipes_changed(model, user.pk, removed, -1)
+    return set(removed)
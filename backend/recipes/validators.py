@@ -11,17 +11,14 @@ def validate_tags(self, data):
 
 
 def validate_ingredients(self, data):
-    if not data or not any('id' in ingredient_data
+    if not data or not any('ingredient_id' in ingredient_data
                            for ingredient_data in data):
         raise serializers.ValidationError(
             'Рецепт не может быть без ингридиентов '
         )
-    unique_ingredients = []
-    for ingredient_data in data:
-        ingredient_id = ingredient_data['id']
-        if ingredient_id in [ingredient['id']
-                             for ingredient in unique_ingredients]:
-            raise serializers.ValidationError(
-                'Ингредиенты должны быть уникальными.')
-        unique_ingredients.append(ingredient_data)
+    ingredient_ids = [
+        ingredient_data['ingredient_id'] for ingredient_data in data]
+    if len(set(ingredient_ids)) != len(ingredient_ids):
+        raise serializers.ValidationError(
+            'Ингредиенты должны быть уникальными.')
     return data
@@ -1,8 +1,6 @@
-import os
-from collections import defaultdict
-
-from django.db.models import Q
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import (BooleanField, Prefetch, Value,
+                              prefetch_related_objects)
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import filters, permissions, status, viewsets
@@ -10,78 +8,105 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from users.models import AuthorSubscription, CustomUser
 
+from .catalog import ingredient_index
+from .feed import backfill_subscription, remove_subscription
 from .filters import RecipeFilter
+from .mixins import CatalogCacheMixin, MembershipContextMixin
 from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from .paginators import CustomPagination
+from .paginators import (FeedPagination, RecipePagination,
+                         SubscriptionPagination)
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (CustomUserSerializer, FavoriteRecipeSerializer,
                           IngredientSerializer, RecipeCreateSerializer,
-                          RecipeFavoriteSerializer, SubscribeUserSerializer,
+                          RecipeFavoriteSerializer, RecipeIdsSerializer,
+                          RecipeReadSerializer, SubscribeUserSerializer,
                           TagSerializer)
+from .shopping_list import (SHOPPING_LIST_FILE_NAME, SHOPPING_LIST_RENDERERS,
+                            get_ingredient_totals, get_shopping_list_data,
+                            get_shopping_list_file)
+from .user_recipes import add_recipes, remove_recipes
 
 
-class IngredientViewset(viewsets.ReadOnlyModelViewSet):
+class IngredientViewset(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (filters.SearchFilter, )
-    search_fields = ('^name',)
-
-    def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        search_param = self.request.query_params.get('name')
-
-        if search_param:
-            queryset = queryset.filter(Q(name__istartswith=search_param))
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny,)
+    catalog = 'ingredients'
 
-        return queryset
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        prefix = params.get('name') or params.get('search') or ''
+        try:
+            limit = int(params['limit'])
+        except (KeyError, ValueError):
+            limit = None
+        else:
+            limit = max(limit, 0)
+        return self.catalog_response(
+            request, f'list:{prefix.lower()}:{limit}',
+            lambda: ingredient_index.search(prefix, limit))
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(MembershipContextMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeCreateSerializer
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (filters.OrderingFilter, DjangoFilterBackend)
-    ordering_fields = ('date')
-    pagination_class = CustomPagination
+    ordering_fields = ('date', 'favorites_count', 'in_carts_count')
+    pagination_class = RecipePagination
     filterset_class = RecipeFilter
 
+    read_actions = ('list', 'retrieve', 'feed')
+
+    def get_queryset(self):
+        if self.action in self.read_actions:
+            return Recipe.objects.for_reading(
+                self.request.user, prefetch=False)
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        # Формы браузерного API и OPTIONS строятся для POST/PUT с тем же
+        # action.
+        if (self.action in self.read_actions
+                and self.request.method in permissions.SAFE_METHODS):
+            return RecipeReadSerializer
+        return super().get_serializer_class()
+
     @action(detail=False,
             methods=['get'],
-            url_path='download_shopping_cart')
+            url_path='feed',
+            permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedPagination(page_size=self.paginator.page_size)
+        page = paginator.paginate_queryset(
+            self.filter_queryset(self.get_queryset()), request, self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False,
+            methods=['get'],
+            url_path='download_shopping_cart',
+            permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
-        shopping_cart_entries = ShoppingCart.objects.filter(user=request.user)
-        ingredient_totals = defaultdict(float)
-
-        file_name = 'ingredients_list.txt'
-        with open(file_name, 'a', encoding='utf-8') as file:
-            file.write('Ингридиенты\tКоличество\tЕдиница измерения\n')
-
-            for entry in shopping_cart_entries:
-                recipe = entry.recipe
-                recipe_ingredients = recipe.recipe_ingredients.all()
-
-                for ingredient_entry in recipe_ingredients:
-                    ingredient = ingredient_entry.ingredient
-                    amount_per_serving = ingredient_entry.amount
-                    total_amount = float(amount_per_serving)
-                    ingredient_totals[ingredient] += total_amount
-
-            for ingredient, total_amount in ingredient_totals.items():
-                line = (
-                    f'{ingredient.name.capitalize()}\t'
-                    f'{total_amount}\t'
-                    f'{ingredient.measurement_unit}\n'
-                )
-                file.write(line)
-
-        response = FileResponse(
-            open(file_name, 'rb'),
-            as_attachment=True,
-            content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
-        os.remove(file_name)
+        renderer = request.accepted_renderer
+        response = Response(get_shopping_list_file(request.user, renderer))
+        if renderer.format != 'json':
+            response['Content-Disposition'] = (
+                'attachment; filename='
+                f'"{SHOPPING_LIST_FILE_NAME.format(renderer.format)}"')
         return response
 
+    @action(detail=False,
+            methods=['get'],
+            url_path='shopping_list',
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_list(self, request):
+        return Response(get_shopping_list_data(
+            get_ingredient_totals(request.user)))
+
     @action(detail=True,
             methods=['post', 'delete'],
             url_path='shopping_cart',
@@ -156,21 +181,102 @@ class RecipeViewSet(viewsets.ModelViewSet):
             Favorite.objects.filter(user=user, recipe=recipe).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def change_recipes(self, request, model, added_error, missing_error):
+        """Добавляет или удаляет сразу несколько рецептов.
+
+        Возвращает результат для каждого id в том же виде, что и
+        одиночные shopping_cart и favorite.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            if request.method == 'POST':
+                recipes = Recipe.objects.in_bulk(ids)
+                changed = add_recipes(model, request.user, list(recipes))
+                success = {
+                    recipe['id']: {'status': status.HTTP_201_CREATED,
+                                   'recipe': recipe}
+                    for recipe in RecipeFavoriteSerializer(
+                        [recipes[pk] for pk in ids if pk in changed],
+                        many=True).data
+                }
+                failure = added_error
+            else:
+                recipes = set(Recipe.objects.filter(
+                    pk__in=ids).values_list('pk', flat=True))
+                changed = remove_recipes(model, request.user, list(recipes))
+                success = {pk: {'status': status.HTTP_204_NO_CONTENT}
+                           for pk in changed}
+                failure = missing_error
+        results = []
+        for pk in ids:
+            if pk not in recipes:
+                result = {'status': status.HTTP_400_BAD_REQUEST,
+                          'errors': 'Рецепт не существует'}
+            elif pk in changed:
+                result = success[pk]
+            else:
+                result = {'status': status.HTTP_400_BAD_REQUEST,
+                          'errors': failure}
+            results.append({'id': pk, **result})
+        return Response({'results': results})
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart',
+            url_name='shopping-cart-bulk',
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_cart_bulk(self, request):
+        return self.change_recipes(
+            request, ShoppingCart, 'Рецепт уже в корзине',
+            'Рецепта нет в корзине')
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite',
+            url_name='favorite-bulk',
+            permission_classes=[permissions.IsAuthenticated])
+    def favorite_bulk(self, request):
+        return self.change_recipes(
+            request, Favorite, 'Рецепт уже в избранном',
+            'Рецепта нет в избранном')
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
-class TagViewset(viewsets.ReadOnlyModelViewSet):
+class TagViewset(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny,)
+    catalog = 'tags'
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(MembershipContextMixin, UserViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     lookup_field = 'pk'
 
+    def get_subscribed_authors(self, authors):
+        return authors.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
+
+    def prefetch_author_recipes(self, authors):
+        recipes = Recipe.objects.filter(author__in=authors)
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            pass
+        else:
+            recipes = recipes.latest_per_author(max(recipes_limit, 0))
+        prefetch_related_objects(authors, Prefetch(
+            'recipes', queryset=recipes.defer('search_vector')))
+        return authors
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -188,8 +294,12 @@ class CustomUserViewSet(UserViewSet):
             subscription, created = AuthorSubscription.objects.get_or_create(
                 subscriber=subscriber, author=user_to_subscribe)
             if created:
+                backfill_subscription(subscriber, user_to_subscribe)
+                author = self.get_subscribed_authors(
+                    CustomUser.objects.filter(pk=user_to_subscribe.pk)).get()
                 response_serializer = SubscribeUserSerializer(
-                    user_to_subscribe, context={'request': request})
+                    self.prefetch_author_recipes([author])[0],
+                    context=self.get_serializer_context())
                 return Response(
                     response_serializer.data,
                     status=status.HTTP_201_CREATED
@@ -206,6 +316,7 @@ class CustomUserViewSet(UserViewSet):
                 subscription = AuthorSubscription.objects.get(
                     subscriber=subscriber, author=user_to_unsubscribe)
                 subscription.delete()
+                remove_subscription(subscriber, user_to_unsubscribe)
                 return Response(
                     {'detail': 'Вы успешно отписались от этого пользователя.'},
                     status=status.HTTP_204_NO_CONTENT
@@ -224,13 +335,15 @@ class CustomUserViewSet(UserViewSet):
         user = self.request.user
         subscribed_authors = AuthorSubscription.objects.filter(
             subscriber=user).values('author')
-        subscribed_users = CustomUser.objects.filter(pk__in=subscribed_authors)
+        subscribed_users = self.get_subscribed_authors(
+            CustomUser.objects.filter(pk__in=subscribed_authors))
 
-        paginator = CustomPagination()
-        result_page = paginator.paginate_queryset(subscribed_users, request)
+        paginator = SubscriptionPagination()
+        result_page = self.prefetch_author_recipes(
+            paginator.paginate_queryset(subscribed_users, request))
 
         response_serializer = SubscribeUserSerializer(
-            result_page, many=True, context={'request': request})
+            result_page, many=True, context=self.get_serializer_context())
 
         return paginator.get_paginated_response(response_serializer.data)
 
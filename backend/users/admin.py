@@ -4,5 +4,6 @@ from users.models import CustomUser
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name', 'password')
+    list_display = ('username', 'email', 'first_name', 'last_name', 'password',
+                    'recipes_count', 'subscribers_count')
     search_fields = ('username', 'email')
@@ -0,0 +1,130 @@
+"""Аутентификация по токену с кэшем.
+
+Токен ищется сначала в LRU-кэше процесса, затем в кэше Django и только
+потом в БД. Запись в кэше процесса считается свежей
+TOKEN_AUTH_LOCAL_TTL секунд, после этого она сверяется с кэшем Django,
+поэтому удалённый токен или изменённый пользователь перестают действовать
+во всех воркерах не позже чем через TOKEN_AUTH_LOCAL_TTL секунд (в своём
+процессе — сразу). Для этого нужен общий для воркеров бэкенд кэша; с кэшем
+в памяти процесса токен каждый раз проверяется по БД.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from grocery_assistant.cache import is_cache_shared
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import CustomUser
+
+TOKEN_KEY = 'auth:token:{}'
+# Хэш пароля в кэш не попадает: при обращении к password Django
+# загрузит его из БД. last_login не кэшируется, чтобы вход не сбрасывал
+# кэш (см. users.signals). Счётчики и версия корзины меняются через
+# QuerySet.update() без сигналов; из кэша они приходят отложенными полями,
+# и save() пользователя из кэша не записывает их устаревшие значения.
+UNCACHED_FIELDS = frozenset((
+    'password', 'last_login',
+    'recipes_count', 'subscribers_count', 'shopping_cart_version',
+))
+
+
+class TokenCache:
+    """LRU токен -> (id пользователя, значения полей) с TTL."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key=None, user_id=None):
+        with self.lock:
+            if key is not None:
+                self.entries.pop(key, None)
+            if user_id is not None:
+                for cached_key, (_, value) in list(self.entries.items()):
+                    if value[0] == user_id:
+                        del self.entries[cached_key]
+
+
+local_cache = TokenCache(
+    settings.TOKEN_AUTH_LOCAL_SIZE, settings.TOKEN_AUTH_LOCAL_TTL)
+
+
+def get_cached_fields():
+    return [field.attname for field in CustomUser._meta.concrete_fields
+            if field.attname not in UNCACHED_FIELDS]
+
+
+def dump_user(user):
+    return (user.pk, {name: getattr(user, name)
+                      for name in get_cached_fields()})
+
+
+def load_user(value):
+    _, fields = value
+    return CustomUser.from_db(
+        DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+
+
+def invalidate_token(key):
+    local_cache.discard(key=key)
+    cache.delete(TOKEN_KEY.format(key))
+
+
+def invalidate_user(user_id):
+    local_cache.discard(user_id=user_id)
+    cache.delete_many([
+        TOKEN_KEY.format(key) for key in
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    ])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запросов к БД для известных токенов.
+
+    Кэшируются только токены активных пользователей; неизвестные токены
+    каждый раз проверяются по БД. Если кэш Django не общий для воркеров,
+    класс работает как обычный TokenAuthentication: иначе выход и смена
+    пароля не дошли бы до других воркеров.
+    """
+
+    def authenticate_credentials(self, key):
+        if not is_cache_shared():
+            return super().authenticate_credentials(key)
+        value = local_cache.get(key)
+        if value is None:
+            value = cache.get(TOKEN_KEY.format(key))
+            if value is None:
+                user, token = super().authenticate_credentials(key)
+                value = dump_user(user)
+                cache.set(TOKEN_KEY.format(key), value,
+                          settings.TOKEN_AUTH_CACHE_TTL)
+                local_cache.set(key, value)
+                return user, token
+            local_cache.set(key, value)
+        user = load_user(value)
+        return user, Token(key=key, user=user)
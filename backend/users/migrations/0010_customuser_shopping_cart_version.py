@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_auto_20261018_1829'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='shopping_cart_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия списка покупок'),
+        ),
+    ]
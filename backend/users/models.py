@@ -15,6 +15,23 @@ class CustomUser(AbstractUser):
         unique=True,
         validators=[validate_reserved_username]
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+    # Меняется при каждом изменении корзины; ключ кэша выгрузки списка
+    # покупок (см. recipes.shopping_list).
+    shopping_cart_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия списка покупок'
+    )
     REQUIRED_FIELDS = ['email', 'first_name', 'last_name']
 
     class Meta:
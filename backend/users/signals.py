@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import UNCACHED_FIELDS, invalidate_token, invalidate_user
+from .models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, created=False, update_fields=None,
+                 **kwargs):
+    # Смена пароля, деактивация и правка профиля сбрасывают кэш; вход
+    # обновляет только last_login, которого в кэше нет.
+    if created or (update_fields and set(update_fields) <= UNCACHED_FIELDS):
+        return
+    invalidate_user(instance.pk)
@@ -0,0 +1,53 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recipes.shopping_list import bump_cart_versions, get_cart_version
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import TOKEN_KEY, local_cache
+from .models import CustomUser
+
+CACHE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }
+})
+class CachedTokenAuthenticationTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        local_cache.entries.clear()
+        self.user = CustomUser.objects.create_user(
+            username='cook', email='cook@example.com', password='old-pass-42',
+            first_name='Иван', last_name='Петров')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_set_password_keeps_cart_version(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertIsNotNone(cache.get(TOKEN_KEY.format(self.token.key)))
+        bump_cart_versions([self.user.pk])
+        bump_cart_versions([self.user.pk])
+
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'old-pass-42',
+            'new_password': 'new-pass-42-secret',
+        })
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(get_cart_version(self.user.pk), 2)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-pass-42-secret'))